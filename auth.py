@@ -1,48 +1,53 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from typing import List
-from passlib.context import CryptContext
-from services_db import get_user
-from passlib.context import CryptContext
-from supabase import create_client
-import os
-
-SUPABASE_URL = os.getenv("SUPABASE_URL")
-SUPABASE_KEY = os.getenv("SUPABASE_KEY")
-supabase = create_client(SUPABASE_URL, SUPABASE_KEY)
+from passwords import password_hasher, pwd_context
+from services_db import get_user, update_user_password
+from tokens import InvalidTokenError, UserCache, create_access_token, decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+user_cache = UserCache()
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
 async def authenticate_user(username: str, password: str):
     # Get the user from Supabase
-    result = supabase.table("users").select("*").eq("username", username).execute()
+    user = await get_user(username)
 
-    if not result.data:
+    if not user:
         return None  # user not found
 
-    user = result.data[0]
-
-    # Verify password hash
-    if not pwd_context.verify(password, user["password"]):
+    # Verify password hash off the event loop
+    valid, new_hash = await password_hasher.verify_and_update(password, user["password"])
+    if not valid:
         return None
 
+    # Stored with an outdated bcrypt cost: replace it now that we know the password
+    if new_hash:
+        await update_user_password(user["username"], new_hash)
+        user["password"] = new_hash
+
     return user
 
+def issue_access_token(user: dict) -> str:
+    return create_access_token(user["username"], user["role"])
+
 async def get_current_user(token: str = Depends(oauth2_scheme)):
-    from services_db import get_user as db_get_user
-    user = await db_get_user(token)
+    try:
+        claims = decode_access_token(token)
+    except InvalidTokenError:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
+    # The signature proves who the caller is; the cached record catches deleted users and role changes
+    user = await user_cache.get(claims["sub"], get_user)
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid authentication credentials")
     return user
 
 def role_required(allowed_roles: List[str]):
     async def role_checker(user = Depends(get_current_user)):
-        if user.role not in allowed_roles:
+        if user["role"] not in allowed_roles:
             raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Operation not permitted for your role")
         return user
     return role_checker
@@ -0,0 +1,38 @@
+"""
+Compare wall time and accuracy of the training search modes.
+
+Usage: python bench_training.py transactions.csv [n_jobs]
+
+Trains the default model three times into a scratch model directory:
+the randomized search, a cold fast search, and a fast search warm-started
+from the previous run. MSE is measured on the held-out 25% split. The
+CSV's daily aggregates are cached before timing, so every run reads them
+from the cache.
+"""
+import sys
+import tempfile
+import time
+from ingest import detect_columns, load_daily_aggregates, resolve_csv_path
+from model_registry import ModelRegistry
+from model_service import ModelService
+
+
+def run(csv_path: str, n_jobs: int = -1):
+    path = resolve_csv_path(csv_path)
+    load_daily_aggregates(path, detect_columns(path))
+    with tempfile.TemporaryDirectory() as model_dir:
+        service = ModelService(ModelRegistry(model_dir))
+        print(f"{'mode':<12}{'wall time':>12}{'test MSE':>16}  search CV MSE (xgb / rf / ridge)")
+        for label, search in (("randomized", "randomized"), ("fast", "fast"), ("fast warm", "fast")):
+            start = time.perf_counter()
+            service.train_model(csv_path, n_jobs=n_jobs, search=search)
+            elapsed = time.perf_counter() - start
+            metadata = service.model_metadata
+            search_mse = " / ".join(f"{metadata['search_mse'][name]:.1f}" for name in ("xgb", "rf", "ridge"))
+            print(f"{label:<12}{elapsed:>11.1f}s{metadata['test_mse']:>16.1f}  {search_mse}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit(__doc__)
+    run(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else -1)
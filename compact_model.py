@@ -0,0 +1,211 @@
+import json
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from xgboost import XGBRegressor
+
+
+class TreeEnsemble:
+    """
+    A forest flattened into node arrays shared by all of its trees.
+
+    Leaves point to themselves, so every row can take exactly `depth` steps
+    down all trees at once without checking for leaves. Rows go left when
+    x[feature] <= threshold (sklearn) or x[feature] < threshold (XGBoost).
+    The output is the mean (random forest) or sum plus base score
+    (boosting) of the leaf values.
+    """
+
+    def __init__(self, feature, threshold, left, right, value, roots, depth, strict, average, base=0.0):
+        self.feature = np.asarray(feature, dtype=np.int32)
+        self.threshold = np.asarray(threshold, dtype=np.float64)
+        self.left = np.asarray(left, dtype=np.int32)
+        self.right = np.asarray(right, dtype=np.int32)
+        self.value = np.asarray(value, dtype=np.float64)
+        self.roots = np.asarray(roots, dtype=np.int32)
+        self.depth = int(depth)
+        self.strict = bool(strict)
+        self.average = bool(average)
+        self.base = float(base)
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        # children[2 * node + 1] is the right child, so each step is one gather per array
+        children = np.column_stack([self.left, self.right]).ravel()
+        flat_x = np.ascontiguousarray(X).ravel()
+        row_offsets = (np.arange(len(X)) * X.shape[1])[:, None]
+        nodes = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.depth):
+            x = flat_x[row_offsets + self.feature[nodes]]
+            go_right = x >= self.threshold[nodes] if self.strict else x > self.threshold[nodes]
+            nodes = children[2 * nodes + go_right]
+        leaves = self.value[nodes]
+        return leaves.mean(axis=1) if self.average else leaves.sum(axis=1) + self.base
+
+    def arrays(self, prefix: str) -> dict:
+        return {
+            f"{prefix}feature": self.feature, f"{prefix}threshold": self.threshold,
+            f"{prefix}left": self.left, f"{prefix}right": self.right, f"{prefix}value": self.value,
+            f"{prefix}roots": self.roots,
+            f"{prefix}params": np.array([self.depth, self.strict, self.average, self.base], dtype=np.float64)
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str):
+        depth, strict, average, base = arrays[f"{prefix}params"]
+        return cls(
+            arrays[f"{prefix}feature"], arrays[f"{prefix}threshold"], arrays[f"{prefix}left"],
+            arrays[f"{prefix}right"], arrays[f"{prefix}value"], arrays[f"{prefix}roots"],
+            depth, strict, average, base
+        )
+
+
+class LinearPart:
+    def __init__(self, coef, intercept):
+        self.coef = np.asarray(coef, dtype=np.float64).ravel()
+        self.intercept = float(np.ravel(intercept)[0])
+
+    def predict(self, X: np.ndarray) -> np.ndarray:
+        return X @ self.coef + self.intercept
+
+    def arrays(self, prefix: str) -> dict:
+        return {f"{prefix}coef": self.coef, f"{prefix}intercept": np.array([self.intercept])}
+
+    @classmethod
+    def from_arrays(cls, arrays, prefix: str):
+        return cls(arrays[f"{prefix}coef"], arrays[f"{prefix}intercept"])
+
+
+def _concat_trees(trees, strict, average, base=0.0):
+    """trees: (feature, threshold, left, right, value, depth) per tree, leaves marked by left == -1."""
+    features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+    offset, depth = 0, 0
+    for feature, threshold, left, right, value, tree_depth in trees:
+        nodes = np.arange(len(left))
+        is_leaf = left < 0
+        features.append(np.where(is_leaf, 0, feature))
+        thresholds.append(np.where(is_leaf, 0.0, threshold))
+        lefts.append(np.where(is_leaf, nodes, left) + offset)
+        rights.append(np.where(is_leaf, nodes, right) + offset)
+        values.append(value)
+        roots.append(offset)
+        offset += len(left)
+        depth = max(depth, tree_depth)
+    return TreeEnsemble(
+        np.concatenate(features), np.concatenate(thresholds), np.concatenate(lefts),
+        np.concatenate(rights), np.concatenate(values), roots, depth, strict, average, base
+    )
+
+
+def _compile_forest(forest: RandomForestRegressor) -> TreeEnsemble:
+    trees = []
+    for estimator in forest.estimators_:
+        tree = estimator.tree_
+        trees.append((
+            tree.feature, tree.threshold, tree.children_left, tree.children_right,
+            tree.value[:, 0, 0], tree.max_depth
+        ))
+    return _concat_trees(trees, strict=False, average=True)
+
+
+def _tree_depth(left, right):
+    depth, frontier = 0, [0]
+    while True:
+        frontier = [child for node in frontier if left[node] >= 0 for child in (left[node], right[node])]
+        if not frontier:
+            return depth
+        depth += 1
+
+
+def _compile_booster(regressor: XGBRegressor) -> TreeEnsemble:
+    # The JSON model holds each tree as flat arrays already; leaf values sit in split_conditions
+    learner = json.loads(regressor.get_booster().save_raw("json"))["learner"]
+    booster = learner["gradient_booster"]
+    if booster["name"] != "gbtree":
+        raise ValueError(f"Unsupported XGBoost booster: {booster['name']}")
+    trees = booster["model"]["trees"]
+    try:
+        trees = trees[:booster["model"]["iteration_indptr"][regressor.best_iteration + 1]]
+    except AttributeError:
+        pass  # no early stopping, every tree is used
+    compiled = []
+    for tree in trees:
+        left = np.array(tree["left_children"])
+        right = np.array(tree["right_children"])
+        conditions = np.array(tree["split_conditions"], dtype=np.float32).astype(np.float64)
+        compiled.append((
+            np.array(tree["split_indices"]), conditions, left, right,
+            np.where(left < 0, conditions, 0.0), _tree_depth(left, right)
+        ))
+    base_score = float(str(learner["learner_model_param"]["base_score"]).strip("[]"))
+    return _concat_trees(compiled, strict=True, average=False, base=base_score)
+
+
+class CompactModel:
+    """
+    A fitted StackingRegressor (tree ensembles and linear models under a
+    linear final estimator) compiled to plain NumPy arrays.
+
+    predict() scores feature rows with a few array operations per tree
+    level and no sklearn, pandas or XGBoost machinery, and the whole model
+    is a handful of contiguous arrays (see nbytes).
+    """
+
+    def __init__(self, parts, final: LinearPart):
+        self.parts = parts
+        self.final = final
+
+    def predict(self, X) -> np.ndarray:
+        X = np.asarray(X, dtype=np.float32).astype(np.float64)
+        # The features are few and discrete, so batches repeat rows; score each distinct row once
+        rows, inverse = np.unique(X, axis=0, return_inverse=True)
+        base_preds = np.column_stack([part.predict(rows) for part in self.parts])
+        return self.final.predict(base_preds)[inverse.ravel()]
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in self._arrays().values())
+
+    def _arrays(self) -> dict:
+        arrays = {"kinds": np.array([isinstance(part, TreeEnsemble) for part in self.parts])}
+        for i, part in enumerate(self.parts):
+            arrays.update(part.arrays(f"p{i}_"))
+        arrays.update(self.final.arrays("final_"))
+        return arrays
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, **self._arrays())
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            parts = [
+                (TreeEnsemble if is_trees else LinearPart).from_arrays(arrays, f"p{i}_")
+                for i, is_trees in enumerate(arrays["kinds"])
+            ]
+            return cls(parts, LinearPart.from_arrays(arrays, "final_"))
+
+
+def compile_model(model) -> CompactModel:
+    """
+    Compile a fitted StackingRegressor into a CompactModel.
+
+    Supports RandomForestRegressor, XGBRegressor (gbtree) and linear base
+    learners with coef_ and intercept_ (Ridge), stacked without passthrough
+    by a linear final estimator. Raises ValueError for anything else.
+    """
+    if getattr(model, "passthrough", False):
+        raise ValueError("Stacking with passthrough is not supported")
+    parts = []
+    for estimator in model.estimators_:
+        if isinstance(estimator, RandomForestRegressor):
+            parts.append(_compile_forest(estimator))
+        elif isinstance(estimator, XGBRegressor):
+            parts.append(_compile_booster(estimator))
+        elif hasattr(estimator, "coef_") and hasattr(estimator, "intercept_"):
+            parts.append(LinearPart(estimator.coef_, estimator.intercept_))
+        else:
+            raise ValueError(f"Cannot compile {type(estimator).__name__}")
+    final = model.final_estimator_
+    if not (hasattr(final, "coef_") and hasattr(final, "intercept_")):
+        raise ValueError(f"Cannot compile final estimator {type(final).__name__}")
+    return CompactModel(parts, LinearPart(final.coef_, final.intercept_))
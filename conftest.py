@@ -0,0 +1,23 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+from sklearn.linear_model import LinearRegression, Ridge
+from xgboost import XGBRegressor
+from features import build_features
+
+@pytest.fixture(scope="session")
+def fitted_ensemble():
+    """The production stacking layout (XGBoost, RandomForest, Ridge), small and fitted on two synthetic years."""
+    X = build_features(pd.date_range("2022-01-01", "2023-12-31"))
+    rng = np.random.default_rng(0)
+    y = 50000 + 8000 * X["is_weekend"] + 5000 * X["Month_end"] + 300 * X["month"] + rng.normal(0, 2000, len(X))
+    model = StackingRegressor(
+        estimators=[
+            ("xgb", XGBRegressor(n_estimators=50, max_depth=4, random_state=42)),
+            ("rf", RandomForestRegressor(n_estimators=30, random_state=42)),
+            ("ridge", Ridge())
+        ],
+        final_estimator=LinearRegression()
+    )
+    return model.fit(X, y)
@@ -1,5 +1,10 @@
+import base64
+import json
 import os
+import httpx
 from dotenv import load_dotenv
+from postgrest import AsyncPostgrestClient
+from postgrest.exceptions import APIError
 from supabase import create_client, Client
 
 # Load environment variables from .env file if it exists
@@ -8,12 +13,133 @@ load_dotenv()
 supabase_url = os.getenv("SUPABASE_URL")
 supabase_key = os.getenv("SUPABASE_KEY")
 
-if not supabase_url or not supabase_key:
-    raise Exception("Supabase credentials are missing")
+# Pool settings for the shared async HTTP/2 client
+DB_MAX_CONNECTIONS = int(os.getenv("DB_MAX_CONNECTIONS", "100"))
+DB_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("DB_MAX_KEEPALIVE_CONNECTIONS", "20"))
+DB_KEEPALIVE_EXPIRY = float(os.getenv("DB_KEEPALIVE_EXPIRY", "30"))
+DB_TIMEOUT = float(os.getenv("DB_TIMEOUT", "10"))
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+
+# Keyset pagination of refill request listings
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "100"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+
+supabase: Client = None
+async_client: AsyncPostgrestClient = None
+
+
+def _require_credentials():
+    if not supabase_url or not supabase_key:
+        raise Exception("Supabase credentials are missing")
 
-# Initialize Supabase client
-supabase: Client = create_client(SUPABASE_URL, SUPABASE_KEY)
 
 def get_supabase_client() -> Client:
     """Return the Supabase client instance"""
+    global supabase
+    if supabase is None:
+        _require_credentials()
+        supabase = create_client(supabase_url, supabase_key)
     return supabase
+
+
+def create_async_client(url: str, key: str) -> AsyncPostgrestClient:
+    """
+    Build an async PostgREST client for a Supabase project on top of a
+    pooled HTTP/2 httpx.AsyncClient, so queries never block the event loop
+    and reuse a bounded set of connections.
+    """
+    rest_url = f"{url}/rest/v1"
+    headers = {"apikey": key, "Authorization": f"Bearer {key}"}
+    http_client = httpx.AsyncClient(
+        base_url=rest_url,
+        headers=headers,
+        http2=True,
+        follow_redirects=True,
+        limits=httpx.Limits(
+            max_connections=DB_MAX_CONNECTIONS,
+            max_keepalive_connections=DB_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=DB_KEEPALIVE_EXPIRY
+        ),
+        timeout=httpx.Timeout(DB_TIMEOUT, connect=DB_CONNECT_TIMEOUT)
+    )
+    return AsyncPostgrestClient(rest_url, headers=headers, http_client=http_client)
+
+
+def get_async_client() -> AsyncPostgrestClient:
+    """Return the shared async PostgREST client instance"""
+    global async_client
+    if async_client is None:
+        _require_credentials()
+        async_client = create_async_client(supabase_url, supabase_key)
+    return async_client
+
+
+async def close_async_client():
+    global async_client
+    if async_client is not None:
+        await async_client.aclose()
+        async_client = None
+
+
+class RefillRequestConflictError(Exception):
+    """The refill request was already approved or refused by someone else."""
+
+
+async def call_transition(client: AsyncPostgrestClient, function: str, params: dict):
+    """
+    Call one of the atomic approve/refuse functions and map their SQLSTATEs:
+    invalid action and unknown request raise ValueError, a lost race raises
+    RefillRequestConflictError.
+    """
+    try:
+        response = await client.rpc(function, params).execute()
+    except APIError as e:
+        if e.code in ("RR400", "RR404"):
+            raise ValueError(e.message)
+        if e.code == "RR409":
+            raise RefillRequestConflictError(e.message)
+        raise Exception(f"Error updating refill request: {e.message}")
+    return response.data
+
+
+async def execute(query, action: str):
+    """Await a PostgREST query, reporting failures the way the services expect."""
+    try:
+        return await query.execute()
+    except APIError as e:
+        raise Exception(f"Error {action}: {e.message}")
+
+
+def encode_cursor(created_at: str, request_id: str) -> str:
+    return base64.urlsafe_b64encode(json.dumps([created_at, request_id]).encode()).decode()
+
+
+def decode_cursor(cursor: str):
+    try:
+        created_at, request_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return str(created_at), str(request_id)
+
+
+async def fetch_page(query, cursor: str, page_size: int, action: str):
+    """
+    Execute one page of a (created_at, request_id)-ordered query.
+
+    Rows strictly after the cursor are fetched with a keyset condition
+    instead of an offset, so every page costs the same index range scan
+    however deep it is. Returns (rows, next cursor or None).
+    """
+    if cursor:
+        created_at, request_id = decode_cursor(cursor)
+        query = query.or_(
+            f'created_at.gt."{created_at}",'
+            f'and(created_at.eq."{created_at}",request_id.gt."{request_id}")'
+        )
+    query = query.order("created_at").order("request_id").limit(page_size + 1)
+    rows = (await execute(query, action)).data
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor(rows[-1]["created_at"], rows[-1]["request_id"])
+    return rows, next_cursor
@@ -0,0 +1,153 @@
+import os
+import threading
+import numpy as np
+import pandas as pd
+import holidays
+
+# Model inputs, in the column order the ensemble is trained and scored with
+FEATURE_COLUMNS = ["month", "Month_end", "is_weekend", "is_holiday", "dayofweek", "year"]
+
+HOLIDAY_YEARS = os.getenv("HOLIDAY_YEARS", "2000-2040")
+
+
+class HolidayCalendar:
+    """
+    Nigerian public holidays plus bank-specific closure days, precomputed
+    for a range of years as a per-day bitmap.
+
+    Membership tests are a single vectorized index into the bitmap, so the
+    forecast path never touches the holidays package. Dates outside the
+    precomputed range extend the range once, under a lock.
+    """
+
+    def __init__(self, first_year: int, last_year: int, closures=()):
+        self._lock = threading.Lock()
+        self._closures = np.array(closures, dtype="datetime64[D]")
+        self._build(first_year, last_year)
+
+    def _build(self, first_year: int, last_year: int):
+        dates = np.array(
+            sorted(holidays.Nigeria(years=range(first_year, last_year + 1)).keys()), dtype="datetime64[D]"
+        )
+        origin = np.datetime64(f"{first_year}-01-01", "D")
+        end = np.datetime64(f"{last_year + 1}-01-01", "D")
+        bitmap = np.zeros(int((end - origin).astype(int)), dtype=bool)
+        all_dates = np.union1d(dates, self._closures)
+        in_range = (all_dates >= origin) & (all_dates < end)
+        bitmap[(all_dates[in_range] - origin).astype(int)] = True
+        # Publish the new state in one assignment so readers never see a half-built calendar
+        self._state = (first_year, last_year, origin, bitmap)
+
+    @property
+    def years(self):
+        first_year, last_year, _, _ = self._state
+        return first_year, last_year
+
+    def add_closures(self, dates):
+        """Mark bank-specific closure days as holidays."""
+        with self._lock:
+            self._closures = np.union1d(self._closures, np.array(dates, dtype="datetime64[D]"))
+            first_year, last_year, _, _ = self._state
+            self._build(first_year, last_year)
+
+    def contains(self, dates) -> np.ndarray:
+        """Vectorized membership test: a boolean array, one entry per date."""
+        days = np.asarray(dates, dtype="datetime64[D]")
+        if days.size == 0:
+            return np.zeros(days.shape, dtype=bool)
+        first_year, last_year, origin, bitmap = self._state
+        lowest, highest = days.min().astype(object).year, days.max().astype(object).year
+        if lowest < first_year or highest > last_year:
+            with self._lock:
+                first_year, last_year, _, _ = self._state
+                if lowest < first_year or highest > last_year:
+                    self._build(min(lowest, first_year), max(highest, last_year))
+            first_year, last_year, origin, bitmap = self._state
+        return bitmap[(days - origin).astype(int)]
+
+    def __contains__(self, date) -> bool:
+        return bool(self.contains([date])[0])
+
+
+_calendar = None
+_calendar_lock = threading.Lock()
+
+
+def get_calendar() -> HolidayCalendar:
+    """Process-wide holiday calendar, built on first use (call at startup to prebuild)."""
+    global _calendar
+    if _calendar is None:
+        with _calendar_lock:
+            if _calendar is None:
+                first_year, last_year = (int(year) for year in HOLIDAY_YEARS.split("-"))
+                _calendar = HolidayCalendar(first_year, last_year)
+    return _calendar
+
+
+def add_calendar_features(df: pd.DataFrame, date_col: str = "date") -> pd.DataFrame:
+    """
+    Add day, month, year, dayofweek, Month_end, is_weekend and is_holiday
+    columns derived from df[date_col], in place, using vectorized operations.
+    """
+    dates = pd.to_datetime(df[date_col]).dt.normalize()
+    df["day"] = dates.dt.day
+    df["month"] = dates.dt.month
+    df["year"] = dates.dt.year
+    df["dayofweek"] = dates.dt.dayofweek
+    df["Month_end"] = ((df["day"] > 27) | (df["day"] < 3)).astype(int)
+    df["is_weekend"] = (df["dayofweek"] >= 5).astype(int)
+    df["is_holiday"] = get_calendar().contains(dates.to_numpy()).astype(int)
+    return df
+
+
+def build_features(dates) -> pd.DataFrame:
+    """Model input rows for each date in dates."""
+    pred_df = add_calendar_features(pd.DataFrame({"date": pd.DatetimeIndex(dates)}))
+    return pred_df[FEATURE_COLUMNS]
+
+
+# Every reachable feature row of one year: month x Month_end x is_holiday x dayofweek
+# (is_weekend follows from dayofweek). A row's feature code is its position in
+# feature_space(first_year, ...).
+CODES_PER_YEAR = 12 * 2 * 2 * 7
+
+
+def feature_space(first_year: int, last_year: int) -> pd.DataFrame:
+    """All reachable model input rows for first_year..last_year, in feature code order."""
+    year, month, month_end, holiday, dayofweek = (
+        grid.ravel() for grid in np.meshgrid(
+            np.arange(first_year, last_year + 1), np.arange(1, 13), [0, 1], [0, 1], np.arange(7), indexing="ij"
+        )
+    )
+    rows = pd.DataFrame({
+        "month": month,
+        "Month_end": month_end,
+        "is_weekend": (dayofweek >= 5).astype(int),
+        "is_holiday": holiday,
+        "dayofweek": dayofweek,
+        "year": year
+    })
+    return rows[FEATURE_COLUMNS]
+
+
+def feature_codes(features: pd.DataFrame, first_year: int) -> np.ndarray:
+    """Feature codes of model input rows (see feature_space)."""
+    return (
+        (((features["year"].to_numpy() - first_year) * 12 + features["month"].to_numpy() - 1) * 2
+         + features["Month_end"].to_numpy()) * 2 + features["is_holiday"].to_numpy()
+    ) * 7 + features["dayofweek"].to_numpy()
+
+
+def date_feature_codes(dates, first_year: int) -> np.ndarray:
+    """Feature codes straight from dates, without building the feature frame."""
+    days = np.asarray(dates, dtype="datetime64[D]")
+    months = days.astype("datetime64[M]")
+    years = months.astype("datetime64[Y]")
+    day = (days - months).astype(int) + 1
+    month = (months - years).astype(int) + 1
+    year = years.astype(int) + 1970
+    month_end = ((day > 27) | (day < 3)).astype(int)
+    # 1970-01-01 was a Thursday (dayofweek 3)
+    dayofweek = (days.astype(int) + 3) % 7
+    holiday = get_calendar().contains(days).astype(int)
+    return ((((year - first_year) * 12 + month - 1) * 2 + month_end) * 2 + holiday) * 7 + dayofweek
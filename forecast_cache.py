@@ -0,0 +1,153 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+import numpy as np
+
+FORECAST_CACHE_SIZE = int(os.getenv("FORECAST_CACHE_SIZE", "10000"))
+FORECAST_CACHE_TTL = float(os.getenv("FORECAST_CACHE_TTL", "300"))
+FORECAST_CACHE_DB = os.getenv("FORECAST_CACHE_DB")
+FORECAST_STORE_MAX_ROWS = int(os.getenv("FORECAST_STORE_MAX_ROWS", "100000"))
+FORECAST_STORE_PURGE_SECONDS = float(os.getenv("FORECAST_STORE_PURGE_SECONDS", "60"))
+
+
+class SQLiteForecastStore:
+    """
+    Forecasts shared between workers through a local SQLite file.
+
+    Any object with the same get/put/invalidate methods can be plugged into
+    ForecastCache instead. At most every purge_seconds, a put deletes expired
+    rows and then the rows closest to expiry beyond max_rows.
+    """
+
+    def __init__(self, path: str, max_rows: int = FORECAST_STORE_MAX_ROWS,
+                 purge_seconds: float = FORECAST_STORE_PURGE_SECONDS):
+        self.max_rows = max_rows
+        self.purge_seconds = purge_seconds
+        self._next_purge = 0.0
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS forecasts ("
+            " model_version TEXT, model_key TEXT, start_date TEXT, horizon INTEGER,"
+            " predictions BLOB, expires_at REAL,"
+            " PRIMARY KEY (model_version, model_key, start_date))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS forecasts_expires_at ON forecasts (expires_at)")
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT predictions, expires_at FROM forecasts"
+                " WHERE model_version = ? AND model_key = ? AND start_date = ?",
+                key
+            ).fetchone()
+        if row is None:
+            return None
+        return np.frombuffer(row[0], dtype=np.float64), row[1]
+
+    def put(self, key, predictions: np.ndarray, expires_at: float):
+        with self._lock:
+            # Never replace a longer horizon with a shorter one
+            self._conn.execute(
+                "INSERT INTO forecasts VALUES (?, ?, ?, ?, ?, ?)"
+                " ON CONFLICT (model_version, model_key, start_date) DO UPDATE SET"
+                " horizon = excluded.horizon, predictions = excluded.predictions, expires_at = excluded.expires_at"
+                " WHERE excluded.horizon >= forecasts.horizon OR forecasts.expires_at < excluded.expires_at - ?",
+                (*key, len(predictions), predictions.astype(np.float64).tobytes(), expires_at, FORECAST_CACHE_TTL)
+            )
+            now = time.time()
+            if now >= self._next_purge:
+                self._next_purge = now + self.purge_seconds
+                self._purge(now)
+
+    def _purge(self, now: float):
+        self._conn.execute("DELETE FROM forecasts WHERE expires_at <= ?", (now,))
+        self._conn.execute(
+            "DELETE FROM forecasts WHERE rowid NOT IN"
+            " (SELECT rowid FROM forecasts ORDER BY expires_at DESC LIMIT ?)",
+            (self.max_rows,)
+        )
+
+    def invalidate(self, model_key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM forecasts WHERE model_key = ?", (model_key,))
+
+
+class ForecastCache:
+    """
+    Daily predictions keyed by (model version, model key, start date).
+
+    Each key keeps the longest horizon computed so far, and shorter
+    requests are answered by slicing it. Entries expire after ttl seconds
+    and the least recently used are evicted beyond max_entries. Because the
+    model version is part of the key, swapping in a new model never serves
+    stale forecasts; invalidate() just frees the old entries early. An
+    optional shared store lets workers reuse each other's results.
+    """
+
+    def __init__(self, max_entries: int = FORECAST_CACHE_SIZE, ttl: float = FORECAST_CACHE_TTL, store=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.store = store
+        self._entries = OrderedDict()  # key -> (expires_at, predictions)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, model_version: str, model_key: str, start_date: str, days: int):
+        """Predictions for the first `days` days, or None if not cached."""
+        key = (model_version, model_key, start_date)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now and len(entry[1]) >= days:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1][:days]
+        if self.store is not None:
+            stored = self.store.get(key)
+            # The shared store uses wall-clock expiry since workers do not share a monotonic clock
+            if stored is not None and stored[1] > time.time() and len(stored[0]) >= days:
+                self._remember(key, stored[0], now + (stored[1] - time.time()))
+                with self._lock:
+                    self.hits += 1
+                return stored[0][:days]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def put(self, model_version: str, model_key: str, start_date: str, predictions: np.ndarray):
+        key = (model_version, model_key, start_date)
+        predictions = np.asarray(predictions, dtype=np.float64)
+        self._remember(key, predictions, time.monotonic() + self.ttl)
+        if self.store is not None:
+            self.store.put(key, predictions, time.time() + self.ttl)
+
+    def invalidate(self, model_key: str):
+        with self._lock:
+            for key in [key for key in self._entries if key[1] == model_key]:
+                del self._entries[key]
+        if self.store is not None:
+            self.store.invalidate(model_key)
+
+    def stats(self):
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+    def _remember(self, key, predictions, expires_at):
+        with self._lock:
+            existing = self._entries.get(key)
+            if existing is not None and existing[0] > time.monotonic() and len(existing[1]) > len(predictions):
+                return
+            self._entries[key] = (expires_at, predictions)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def default_forecast_cache() -> ForecastCache:
+    store = SQLiteForecastStore(FORECAST_CACHE_DB) if FORECAST_CACHE_DB else None
+    return ForecastCache(store=store)
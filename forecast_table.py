@@ -0,0 +1,59 @@
+import os
+import numpy as np
+from features import CODES_PER_YEAR, build_features, date_feature_codes, feature_codes, feature_space
+
+# Years past the end of the training data covered by a model's table
+FORECAST_TABLE_YEARS_AHEAD = int(os.getenv("FORECAST_TABLE_YEARS_AHEAD", "5"))
+
+
+class ForecastTable:
+    """
+    A model's prediction for every reachable feature row of a range of
+    years, as a dense array indexed by feature code (see features.py).
+
+    The feature space is small (336 rows per year), so the whole table is
+    scored once when a model is published, and forecasting becomes a
+    gather. Dates outside the table's years are left to the model.
+    """
+
+    def __init__(self, values: np.ndarray, first_year: int):
+        self.values = np.asarray(values, dtype=np.float64)
+        self.first_year = int(first_year)
+        self.last_year = self.first_year + len(self.values) // CODES_PER_YEAR - 1
+
+    @classmethod
+    def build(cls, model, first_year: int, last_year: int):
+        return cls(model.predict(feature_space(first_year, last_year)).astype(float), first_year)
+
+    def covers(self, years) -> bool:
+        years = np.asarray(years)
+        return years.size == 0 or (years.min() >= self.first_year and years.max() <= self.last_year)
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, values=self.values, first_year=np.array([self.first_year]))
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as arrays:
+            return cls(arrays["values"], arrays["first_year"][0])
+
+
+class TabulatedModel:
+    """A model served from its ForecastTable, falling back to the model outside the table's years."""
+
+    def __init__(self, model, table: ForecastTable):
+        self.model = model
+        self.table = table
+
+    def predict(self, features) -> np.ndarray:
+        if not self.table.covers(features["year"].to_numpy()):
+            return self.model.predict(features)
+        return self.table.values[feature_codes(features, self.table.first_year)]
+
+    def predict_dates(self, dates) -> np.ndarray:
+        """Predictions for dates, skipping the feature frame when the table covers them."""
+        days = np.asarray(dates, dtype="datetime64[D]")
+        if not self.table.covers(days.astype("datetime64[Y]").astype(int) + 1970):
+            return self.model.predict(build_features(days))
+        return self.table.values[date_feature_codes(days, self.table.first_year)]
@@ -0,0 +1,210 @@
+import hashlib
+import os
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from features import add_calendar_features
+
+INGEST_CHUNK_ROWS = int(os.getenv("INGEST_CHUNK_ROWS", "500000"))
+DATA_CACHE_DIR = os.getenv("DATA_CACHE_DIR", "data_cache")
+
+
+def resolve_csv_path(csv_path: str) -> Path:
+    clean_path = csv_path.strip('\"\'')
+    if not clean_path.lower().endswith('.csv'):
+        clean_path += '.csv'
+    path = Path(clean_path)
+    if not path.exists():
+        raise FileNotFoundError("File not found")
+    return path
+
+
+def detect_columns(path: Path) -> dict:
+    """Map the first three CSV columns to the date, amount and balance roles."""
+    try:
+        headers = pd.read_csv(path, nrows=0).columns.tolist()
+    except pd.errors.EmptyDataError:
+        raise ValueError("CSV file is empty")
+    if len(headers) < 3:
+        raise ValueError("CSV needs at least 3 columns")
+    return {
+        "date": headers[0],
+        "amount": headers[1],
+        "balance": headers[2]
+    }
+
+
+def _aggregate_daily(chunk: pd.DataFrame, column_names: dict) -> pd.DataFrame:
+    amount_col, balance_col = column_names["amount"], column_names["balance"]
+    dates = pd.to_datetime(chunk[column_names["date"]]).dt.normalize()
+    return chunk[[amount_col, balance_col]].groupby(dates.rename("date")).agg(
+        {amount_col: "sum", balance_col: "min"}
+    )
+
+
+def _merge_daily(chunks, column_names: dict) -> pd.DataFrame:
+    amount_col, balance_col = column_names["amount"], column_names["balance"]
+    daily = None
+    for chunk in chunks:
+        partial = _aggregate_daily(chunk, column_names)
+        if daily is None:
+            daily = partial
+        else:
+            daily = pd.concat([daily, partial]).groupby(level=0).agg({amount_col: "sum", balance_col: "min"})
+    if daily is None or daily.empty:
+        raise ValueError("CSV file is empty")
+    return daily.sort_index().reset_index()
+
+
+def read_daily_aggregates(path: Path, column_names: dict, chunksize: int = INGEST_CHUNK_ROWS) -> pd.DataFrame:
+    """
+    Stream a transaction CSV in chunks and reduce it to one row per day:
+    the sum of amount and the minimum balance, sorted by date.
+
+    Only the three model columns are parsed, and each chunk's daily partial
+    is merged into the running aggregate before the next chunk is read, so
+    peak memory depends on the number of distinct days plus one chunk, not
+    on the number of transactions.
+    """
+    amount_col, balance_col = column_names["amount"], column_names["balance"]
+    reader = pd.read_csv(
+        path,
+        usecols=[column_names["date"], amount_col, balance_col],
+        dtype={amount_col: "float64", balance_col: "float64"},
+        chunksize=chunksize
+    )
+    return _merge_daily(reader, column_names)
+
+
+def file_digest(path: Path) -> str:
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def convert_to_parquet(path: Path, column_names: dict, target: Path):
+    """Convert a transaction CSV to Parquet, streaming it block by block."""
+    # Only the columns the forecast reads; types inferred from the first block
+    # would not hold for every block of an arbitrary extra column
+    convert_options = pa_csv.ConvertOptions(
+        column_types={
+            column_names["amount"]: pa.float64(),
+            column_names["balance"]: pa.float64()
+        },
+        include_columns=[column_names["date"], column_names["amount"], column_names["balance"]]
+    )
+    reader = pa_csv.open_csv(path, convert_options=convert_options)
+    tmp_target = target.with_suffix(".tmp")
+    with pq.ParquetWriter(tmp_target, reader.schema) as writer:
+        for batch in reader:
+            writer.write_batch(batch)
+    os.replace(tmp_target, target)
+
+
+def read_parquet_daily_aggregates(path: Path, column_names: dict, chunksize: int = INGEST_CHUNK_ROWS) -> pd.DataFrame:
+    """Same reduction as read_daily_aggregates, over a Parquet file's record batches."""
+    parquet_file = pq.ParquetFile(path, memory_map=True)
+    batches = parquet_file.iter_batches(
+        batch_size=chunksize,
+        columns=[column_names["date"], column_names["amount"], column_names["balance"]]
+    )
+    return _merge_daily((batch.to_pandas() for batch in batches), column_names)
+
+
+def load_daily_aggregates(path: Path, column_names: dict, chunksize: int = INGEST_CHUNK_ROWS,
+                          cache_dir: str = DATA_CACHE_DIR):
+    """
+    Daily aggregates with calendar features for a transaction CSV, cached by
+    the file's content hash. Returns (daily frame, content hash).
+
+    The first call converts the CSV to Parquet and writes the daily frame
+    as a small Parquet file next to it; later calls for the same content
+    (retrains, search experiments, max_refill recomputation) memory-map the
+    cached daily frame instead of parsing the CSV again.
+    """
+    cache_dir = Path(cache_dir)
+    digest = file_digest(path)
+    daily_path = cache_dir / f"{digest}.daily.parquet"
+    if daily_path.exists():
+        return pd.read_parquet(daily_path, memory_map=True), digest
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    raw_path = cache_dir / f"{digest}.parquet"
+    if not raw_path.exists():
+        convert_to_parquet(path, column_names, raw_path)
+    daily = add_calendar_features(read_parquet_daily_aggregates(raw_path, column_names, chunksize), "date")
+    save_daily_aggregates(daily, digest, cache_dir)
+    return daily, digest
+
+
+def save_daily_aggregates(daily: pd.DataFrame, digest: str, cache_dir: str = DATA_CACHE_DIR):
+    cache_dir = Path(cache_dir)
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    daily_path = cache_dir / f"{digest}.daily.parquet"
+    tmp_path = daily_path.with_suffix(".tmp")
+    daily.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, daily_path)
+
+
+def read_cached_daily_aggregates(digest: str, cache_dir: str = DATA_CACHE_DIR) -> pd.DataFrame:
+    daily_path = Path(cache_dir) / f"{digest}.daily.parquet"
+    if not daily_path.exists():
+        raise ValueError("Cached daily aggregates not found. Please retrain on the full history.")
+    return pd.read_parquet(daily_path, memory_map=True)
+
+
+def append_daily_aggregates(daily: pd.DataFrame, new_daily: pd.DataFrame, column_names: dict) -> pd.DataFrame:
+    """
+    Merge new daily aggregates into existing ones. Days present in both are
+    combined (amounts summed, lowest balance kept) and their calendar
+    features recomputed.
+    """
+    amount_col, balance_col = column_names["amount"], column_names["balance"]
+    merged = pd.concat([
+        daily[["date", amount_col, balance_col]],
+        new_daily[["date", amount_col, balance_col]]
+    ]).groupby("date").agg({amount_col: "sum", balance_col: "min"}).sort_index().reset_index()
+    return add_calendar_features(merged, "date")
+
+
+def refill_statistics(daily: pd.DataFrame, amount_col: str, balance_col: str) -> pd.DataFrame:
+    """
+    Group consecutive days between refills (a day whose minimum balance
+    rose above the previous day's) and total each group's withdrawals and
+    calendar features. max_refill is the largest group total.
+    """
+    refill_groups = (daily[balance_col] > daily[balance_col].shift(1)).cumsum()
+    return daily.groupby(refill_groups.rename("refill_group")).agg({
+        amount_col: "sum",
+        "Month_end": "sum",
+        "is_weekend": "sum",
+        "is_holiday": "sum",
+        "dayofweek": "sum",
+        "year": "sum"
+    }).reset_index()
+
+
+def update_refill_state(state: dict, max_refill: float, new_daily: pd.DataFrame, amount_col: str, balance_col: str):
+    """
+    Advance the refill-group statistics over days that follow state["last_date"].
+
+    state holds the last day's balance and the running total of the group
+    still open on that day. Returns (new state, new max_refill) without
+    revisiting earlier history.
+    """
+    balances = new_daily[balance_col].to_numpy()
+    previous = np.concatenate([[state["last_balance"]], balances[:-1]])
+    groups = np.cumsum(balances > previous)
+    totals = np.bincount(groups, weights=new_daily[amount_col].to_numpy())
+    # Group 0 continues the group that was open before the new days
+    totals[0] += state["open_group_total"]
+    new_state = {
+        "last_date": new_daily["date"].iloc[-1].strftime('%Y-%m-%d'),
+        "last_balance": float(balances[-1]),
+        "open_group_total": float(totals[-1])
+    }
+    return new_state, max(float(max_refill), float(totals.max()))
@@ -0,0 +1,10 @@
+-- Refill request listings page by (created_at, request_id); these indexes
+-- let each page be a bounded index range scan.
+
+-- Table used by services_db.py
+create index if not exists refillrequest_created_at_request_id_idx
+    on refillrequest (created_at, request_id);
+
+-- Table used by main.py
+create index if not exists refill_requests_created_at_request_id_idx
+    on refill_requests (created_at, request_id);
@@ -0,0 +1,83 @@
+-- Atomic approve/refuse transitions, called through PostgREST RPC.
+--
+-- Each function moves a Pending request to Approved or Refused with a
+-- conditional update and records the decision in the same transaction, so
+-- two managers acting at once cannot both succeed. Errors use custom
+-- SQLSTATEs that the API maps to responses:
+--   RR400 invalid action, RR404 request not found, RR409 already processed.
+
+-- Tables used by services_db.py
+create or replace function take_action_on_refillrequest(
+    p_request_id uuid,
+    p_action text,
+    p_approver text,
+    p_role text,
+    p_comment text default null
+) returns refillrequest
+language plpgsql
+as $$
+declare
+    v_request refillrequest;
+begin
+    if lower(p_action) not in ('approve', 'refuse') then
+        raise exception 'Invalid action' using errcode = 'RR400';
+    end if;
+
+    update refillrequest
+       set status = case lower(p_action) when 'approve' then 'Approved' else 'Refused' end,
+           updated_at = now()
+     where request_id = p_request_id
+       and status = 'Pending'
+    returning * into v_request;
+
+    if not found then
+        if exists (select 1 from refillrequest where request_id = p_request_id) then
+            raise exception 'Refill request already processed' using errcode = 'RR409';
+        end if;
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end if;
+
+    insert into approvalrecord (refill_request_id, approver, role, action, comment, timestamp)
+    values (p_request_id, p_approver, p_role, lower(p_action), p_comment, now());
+
+    return v_request;
+end;
+$$;
+
+-- Tables used by main.py
+create or replace function take_action_on_refill_requests(
+    p_request_id uuid,
+    p_action text,
+    p_approver text,
+    p_role text,
+    p_comment text default null
+) returns refill_requests
+language plpgsql
+as $$
+declare
+    v_request refill_requests;
+begin
+    if lower(p_action) not in ('approve', 'refuse') then
+        raise exception 'Invalid action' using errcode = 'RR400';
+    end if;
+
+    update refill_requests
+       set status = case lower(p_action) when 'approve' then 'Approved' else 'Refused' end,
+           updated_at = now()
+     where request_id = p_request_id
+       and status = 'Pending'
+    returning * into v_request;
+
+    if not found then
+        if exists (select 1 from refill_requests where request_id = p_request_id) then
+            raise exception 'Refill request already processed' using errcode = 'RR409';
+        end if;
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end if;
+
+    insert into approval_history (request_id, approver, action, comment, timestamp, role)
+    values (p_request_id, p_approver, initcap(p_action), p_comment, now(), p_role);
+
+    return v_request;
+end;
+$$;
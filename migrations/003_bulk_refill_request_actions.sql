@@ -0,0 +1,110 @@
+-- Bulk approve/refuse in one RPC call. p_items is a JSON array of
+-- {"request_id", "action", "comment"} objects. Each item is transitioned
+-- with the same conditional update as the single-item functions; items
+-- that cannot be transitioned are reported instead of failing the batch.
+
+-- Tables used by services_db.py
+create or replace function take_bulk_action_on_refillrequest(
+    p_items jsonb,
+    p_approver text,
+    p_role text
+) returns table (item_request_id text, item_status text, item_error text)
+language plpgsql
+as $$
+declare
+    v_item jsonb;
+    v_request_id uuid;
+    v_action text;
+begin
+    for v_item in select value from jsonb_array_elements(p_items) loop
+        item_request_id := v_item ->> 'request_id';
+        item_status := null;
+        item_error := null;
+        v_action := lower(v_item ->> 'action');
+        begin
+            v_request_id := item_request_id::uuid;
+        exception when invalid_text_representation then
+            item_error := 'Refill request not found';
+            return next;
+            continue;
+        end;
+        if v_action is null or v_action not in ('approve', 'refuse') then
+            item_error := 'Invalid action';
+            return next;
+            continue;
+        end if;
+
+        update refillrequest r
+           set status = case v_action when 'approve' then 'Approved' else 'Refused' end,
+               updated_at = now()
+         where r.request_id = v_request_id
+           and r.status = 'Pending'
+        returning r.status into item_status;
+
+        if not found then
+            if exists (select 1 from refillrequest r where r.request_id = v_request_id) then
+                item_error := 'Refill request already processed';
+            else
+                item_error := 'Refill request not found';
+            end if;
+        else
+            insert into approvalrecord (refill_request_id, approver, role, action, comment, timestamp)
+            values (v_request_id, p_approver, p_role, v_action, v_item ->> 'comment', now());
+        end if;
+        return next;
+    end loop;
+end;
+$$;
+
+-- Tables used by main.py
+create or replace function take_bulk_action_on_refill_requests(
+    p_items jsonb,
+    p_approver text,
+    p_role text
+) returns table (item_request_id text, item_status text, item_error text)
+language plpgsql
+as $$
+declare
+    v_item jsonb;
+    v_request_id uuid;
+    v_action text;
+begin
+    for v_item in select value from jsonb_array_elements(p_items) loop
+        item_request_id := v_item ->> 'request_id';
+        item_status := null;
+        item_error := null;
+        v_action := lower(v_item ->> 'action');
+        begin
+            v_request_id := item_request_id::uuid;
+        exception when invalid_text_representation then
+            item_error := 'Refill request not found';
+            return next;
+            continue;
+        end;
+        if v_action is null or v_action not in ('approve', 'refuse') then
+            item_error := 'Invalid action';
+            return next;
+            continue;
+        end if;
+
+        update refill_requests r
+           set status = case v_action when 'approve' then 'Approved' else 'Refused' end,
+               updated_at = now()
+         where r.request_id = v_request_id
+           and r.status = 'Pending'
+        returning r.status into item_status;
+
+        if not found then
+            if exists (select 1 from refill_requests r where r.request_id = v_request_id) then
+                item_error := 'Refill request already processed';
+            else
+                item_error := 'Refill request not found';
+            end if;
+        else
+            insert into approval_history (request_id, approver, action, comment, timestamp, role)
+            values (v_request_id, p_approver, initcap(v_action), v_item ->> 'comment', now(), p_role);
+        end if;
+        return next;
+    end loop;
+end;
+$$;
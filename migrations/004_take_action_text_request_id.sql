@@ -0,0 +1,97 @@
+-- take_action_on_refillrequest / take_action_on_refill_requests (002) took
+-- p_request_id as uuid, so a malformed ID failed in PostgREST's cast with
+-- 22P02 before the function ran. They now take text and cast it themselves,
+-- reporting an unparseable ID as RR404 like the bulk functions (003).
+
+drop function if exists take_action_on_refillrequest(uuid, text, text, text, text);
+drop function if exists take_action_on_refill_requests(uuid, text, text, text, text);
+
+-- Tables used by services_db.py
+create or replace function take_action_on_refillrequest(
+    p_request_id text,
+    p_action text,
+    p_approver text,
+    p_role text,
+    p_comment text default null
+) returns refillrequest
+language plpgsql
+as $$
+declare
+    v_request_id uuid;
+    v_request refillrequest;
+begin
+    begin
+        v_request_id := p_request_id::uuid;
+    exception when invalid_text_representation then
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end;
+
+    if lower(p_action) not in ('approve', 'refuse') then
+        raise exception 'Invalid action' using errcode = 'RR400';
+    end if;
+
+    update refillrequest
+       set status = case lower(p_action) when 'approve' then 'Approved' else 'Refused' end,
+           updated_at = now()
+     where request_id = v_request_id
+       and status = 'Pending'
+    returning * into v_request;
+
+    if not found then
+        if exists (select 1 from refillrequest where request_id = v_request_id) then
+            raise exception 'Refill request already processed' using errcode = 'RR409';
+        end if;
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end if;
+
+    insert into approvalrecord (refill_request_id, approver, role, action, comment, timestamp)
+    values (v_request_id, p_approver, p_role, lower(p_action), p_comment, now());
+
+    return v_request;
+end;
+$$;
+
+-- Tables used by main.py
+create or replace function take_action_on_refill_requests(
+    p_request_id text,
+    p_action text,
+    p_approver text,
+    p_role text,
+    p_comment text default null
+) returns refill_requests
+language plpgsql
+as $$
+declare
+    v_request_id uuid;
+    v_request refill_requests;
+begin
+    begin
+        v_request_id := p_request_id::uuid;
+    exception when invalid_text_representation then
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end;
+
+    if lower(p_action) not in ('approve', 'refuse') then
+        raise exception 'Invalid action' using errcode = 'RR400';
+    end if;
+
+    update refill_requests
+       set status = case lower(p_action) when 'approve' then 'Approved' else 'Refused' end,
+           updated_at = now()
+     where request_id = v_request_id
+       and status = 'Pending'
+    returning * into v_request;
+
+    if not found then
+        if exists (select 1 from refill_requests where request_id = v_request_id) then
+            raise exception 'Refill request already processed' using errcode = 'RR409';
+        end if;
+        raise exception 'Refill request not found' using errcode = 'RR404';
+    end if;
+
+    insert into approval_history (request_id, approver, action, comment, timestamp, role)
+    values (v_request_id, p_approver, initcap(p_action), p_comment, now(), p_role);
+
+    return v_request;
+end;
+$$;
@@ -0,0 +1,165 @@
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+import model_store
+from forecast_table import TabulatedModel
+
+MODEL_DIR = os.getenv("MODEL_DIR", "models")
+MODEL_CACHE_BYTES = int(os.getenv("MODEL_CACHE_BYTES", str(2 * 1024 ** 3)))
+DEFAULT_MODEL_KEY = "default"
+# Serve models compiled to NumPy arrays instead of the sklearn ensemble when available
+COMPACT_INFERENCE = os.getenv("COMPACT_INFERENCE", "1") == "1"
+
+
+class ModelRegistry:
+    """
+    Fitted models keyed by ATM ID (or by cluster).
+
+    Models are persisted to disk as versioned artifacts when registered,
+    loaded lazily on first use and kept in an LRU cache bounded by an
+    approximate memory budget (the size of each artifact on disk). Evicted
+    models are reloaded from their latest artifact on demand. Keys with no
+    artifact are remembered, so ATMs served by the default model do not
+    check the disk on every forecast; refresh() forgets them.
+
+    With compact=True the cached model is the artifact's CompactModel,
+    which predicts the same values from a fraction of the memory; load()
+    still returns the full ensemble for retraining. Models saved with a
+    ForecastTable are served as a TabulatedModel over it.
+
+    Cluster assignments are stored in the model directory, so they survive
+    restarts and are shared with training processes.
+    """
+
+    def __init__(self, model_dir: str = MODEL_DIR, max_bytes: int = MODEL_CACHE_BYTES,
+                 compact: bool = COMPACT_INFERENCE):
+        self.model_dir = Path(model_dir)
+        self.max_bytes = max_bytes
+        self.compact = compact
+        self._entries = OrderedDict()  # key -> (model, metadata, size)
+        self._missing = set()  # keys known to have no artifact
+        self._loading = {}  # key -> lock held while that key is loaded from disk
+        self._clusters = model_store.load_clusters(self.model_dir)  # atm_id -> cluster key
+        self._bytes = 0
+        self._lock = threading.RLock()
+
+    def assign(self, atm_id: str, cluster: str):
+        """Serve atm_id from the model registered under cluster."""
+        model_store.validate_key(cluster)
+        with self._lock:
+            # Merge with assignments other processes may have written since
+            self._clusters = {**model_store.load_clusters(self.model_dir), atm_id: cluster}
+            model_store.save_clusters(self.model_dir, self._clusters)
+
+    def resolve(self, atm_id: str = None) -> str:
+        """Model key serving atm_id; raises ValueError for IDs that cannot be a model key."""
+        if atm_id is None:
+            return DEFAULT_MODEL_KEY
+        return model_store.validate_key(self._clusters.get(atm_id, atm_id))
+
+    def register(self, key: str, model, metadata: dict, table=None) -> str:
+        version = model_store.save_model(self.model_dir, key, model, metadata, table)
+        metadata["version"] = version
+        compact = model_store.load_compact_model(self.model_dir, key, version) if self.compact else None
+        if compact is not None:
+            model, size = compact[0], model_store.compact_size(self.model_dir, key, version)
+        else:
+            size = model_store.artifact_size(self.model_dir, key, version)
+        with self._lock:
+            self._missing.discard(key)
+            self._store(key, TabulatedModel(model, table) if table is not None else model, metadata, size)
+        return version
+
+    def get(self, key: str):
+        """Return (model, metadata) for key, loading it from disk if needed."""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None or key in self._missing:
+                return entry
+            loading = self._loading.setdefault(key, threading.Lock())
+        # Other keys keep being served while this one is read from disk
+        with loading:
+            with self._lock:
+                entry = self._lookup(key)
+                if entry is not None or key in self._missing:
+                    return entry
+            artifact = self._read(key)
+            with self._lock:
+                self._loading.pop(key, None)
+                entry = self._lookup(key)
+                if entry is not None:
+                    return entry  # registered while we were reading an older version
+                if artifact is None:
+                    self._missing.add(key)
+                    return None
+                self._store(key, *artifact)
+                return artifact[0], artifact[1]
+
+    def _lookup(self, key: str):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0], entry[1]
+
+    def _read(self, key: str):
+        """(model, metadata, size) of key's latest artifact, or None."""
+        artifact = model_store.load_compact_model(self.model_dir, key) if self.compact else None
+        if artifact is not None:
+            size = model_store.compact_size(self.model_dir, key, artifact[1]["version"])
+        else:
+            artifact = model_store.load_model(self.model_dir, key)
+            if artifact is None:
+                return None
+            size = model_store.artifact_size(self.model_dir, key, artifact[1]["version"])
+        model, metadata = artifact
+        table = model_store.load_table(self.model_dir, key, metadata["version"])
+        if table is not None:
+            model = TabulatedModel(model, table)
+        return model, metadata, size
+
+    def load(self, key: str):
+        """(full fitted ensemble, metadata) of key's latest artifact, bypassing the cache."""
+        return model_store.load_model(self.model_dir, key)
+
+    def evict(self, key: str):
+        with self._lock:
+            self._missing.discard(key)
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def refresh(self) -> list:
+        """
+        Pick up artifacts written by other processes: drop cached models
+        whose latest version on disk has moved on, forget remembered misses
+        and reread the cluster assignments. Returns the dropped keys.
+        """
+        with self._lock:
+            loaded = {key: entry[1].get("version") for key, entry in self._entries.items()}
+        stale = [key for key, version in loaded.items() if model_store.latest_version(self.model_dir, key) != version]
+        clusters = model_store.load_clusters(self.model_dir)
+        with self._lock:
+            self._clusters = clusters
+            self._missing.clear()
+            for key in stale:
+                self.evict(key)
+        return stale
+
+    def stats(self):
+        with self._lock:
+            return {
+                "loaded_models": len(self._entries),
+                "loaded_bytes": self._bytes,
+                "max_bytes": self.max_bytes
+            }
+
+    def _store(self, key, model, metadata, size):
+        self.evict(key)
+        self._entries[key] = (model, metadata, size)
+        self._bytes += size
+        # Keep at least the model just stored, even if it alone exceeds the budget
+        while self._bytes > self.max_bytes and len(self._entries) > 1:
+            _, (_, _, evicted_size) = self._entries.popitem(last=False)
+            self._bytes -= evicted_size
@@ -1,161 +1,429 @@
+import copy
+import hashlib
+import os
+import numpy as np
 import pandas as pd
-import holidays
-from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from joblib import effective_n_jobs
 from xgboost import XGBRegressor
+from sklearn.base import clone
 from sklearn.ensemble import RandomForestRegressor, StackingRegressor
+from sklearn.experimental import enable_halving_search_cv  # noqa: F401
 from sklearn.linear_model import Ridge, LinearRegression
-from sklearn.model_selection import RandomizedSearchCV, train_test_split
+from sklearn.model_selection import HalvingRandomSearchCV, RandomizedSearchCV, train_test_split
+from sklearn.utils import Bunch
 from scipy.stats import loguniform
 from datetime import datetime
+from ingest import (
+    INGEST_CHUNK_ROWS, append_daily_aggregates, detect_columns, file_digest, load_daily_aggregates,
+    read_cached_daily_aggregates, read_daily_aggregates, refill_statistics, resolve_csv_path,
+    save_daily_aggregates, update_refill_state
+)
+from features import FEATURE_COLUMNS, add_calendar_features, build_features
+from forecast_cache import ForecastCache, default_forecast_cache
+from forecast_table import FORECAST_TABLE_YEARS_AHEAD, ForecastTable
+from model_registry import ModelRegistry
+
+DRIFT_THRESHOLD = float(os.getenv("DRIFT_THRESHOLD", "1.5"))
+INCREMENTAL_BOOST_ROUNDS = int(os.getenv("INCREMENTAL_BOOST_ROUNDS", "50"))
+# Out-of-sample residuals kept in the metadata for probabilistic forecasts
+RESIDUAL_SAMPLE_SIZE = int(os.getenv("RESIDUAL_SAMPLE_SIZE", "5000"))
+MONTE_CARLO_PATHS = int(os.getenv("MONTE_CARLO_PATHS", "10000"))
+FORECAST_QUANTILES = (0.5, 0.9, 0.99)
+# Longest horizon the API accepts for a single forecast
+MAX_FORECAST_DAYS = int(os.getenv("MAX_FORECAST_DAYS", "366"))
+
+XGB_PARAM_GRID = {
+    'n_estimators': [100, 200, 300, 400, 500],
+    'max_depth': [3, 5, 7, 9],
+    'learning_rate': [0.01, 0.05, 0.1, 0.2],
+    'subsample': [0.6, 0.8, 1.0],
+    'colsample_bytree': [0.6, 0.8, 1.0],
+    'gamma': [0, 0.1, 0.2],
+    'min_child_weight': [1, 3, 5]
+}
+RF_PARAM_GRID = {
+    'n_estimators': [100, 200, 300, 400, 500],
+    'max_depth': [None, 5, 10, 20, 30],
+    'min_samples_split': [2, 5, 10],
+    'min_samples_leaf': [1, 2, 4],
+    # 'auto' is no longer accepted by RandomForestRegressor; 1.0 is what it meant for regression
+    'max_features': [1.0, 'sqrt', 'log2'],
+    'bootstrap': [True, False]
+}
+RIDGE_PARAM_GRID = {
+    'alpha': loguniform(1e-4, 100),
+    'fit_intercept': [True, False],
+    'solver': ['auto', 'svd', 'cholesky', 'lsqr', 'sparse_cg', 'sag', 'saga'],
+    'max_iter': [100, 500, 1000, 2000],
+    'tol': [1e-4, 1e-3, 1e-2]
+}
+
+
+def _neighbourhood(grid: dict, previous: dict = None) -> dict:
+    """
+    Warm-start a search: narrow each parameter to the previous best value
+    and its neighbours in the grid (or a decade either side for log-uniform
+    distributions). Parameters without a previous value keep the full grid.
+    """
+    if not previous:
+        return grid
+    narrowed = {}
+    for name, values in grid.items():
+        best = previous.get(name)
+        if isinstance(values, list) and best in values:
+            i = values.index(best)
+            narrowed[name] = values[max(0, i - 1):i + 2]
+        elif hasattr(values, "rvs") and isinstance(best, (int, float)) and best > 0:
+            narrowed[name] = loguniform(best / 10, best * 10)
+        else:
+            narrowed[name] = values
+    return narrowed
 
 class ModelService:
-    def __init__(self):
-        self.trained_model = None
-        self.model_metadata = {
+    def __init__(self, registry: ModelRegistry = None, forecast_cache: ForecastCache = None):
+        self.registry = registry or ModelRegistry()
+        self.forecast_cache = forecast_cache or default_forecast_cache()
+        # (model, metadata) of the default model, swapped as one tuple so a
+        # forecast never pairs one version's model with another's metadata
+        self.default_entry = (None, {
             "max_refill": None,
             "column_names": None
-        }
+        })
+        default = self.registry.get(self.registry.resolve(None))
+        if default:
+            self.default_entry = default
 
-    def train_model(self, csv_path: str):
-        clean_path = csv_path.strip('\"\'')
-        if not clean_path.lower().endswith('.csv'):
-            clean_path += '.csv'
-        path = Path(clean_path)
-        if not path.exists():
-            raise FileNotFoundError("File not found")
-        df = pd.read_csv(path)
-        if df.empty:
-            raise ValueError("CSV file is empty")
-        headers = df.columns.tolist()
-        if len(headers) < 3:
-            raise ValueError("CSV needs at least 3 columns")
-        date_col, amount_col, balance_col = headers[0], headers[1], headers[2]
-        self.model_metadata["column_names"] = {
-            "date": date_col,
-            "amount": amount_col,
-            "balance": balance_col
-        }
-        df[date_col] = pd.to_datetime(df[date_col])
-        df["date"] = df[date_col].dt.date
-        df["day"] = df[date_col].dt.day
-        df["dayofweek"] = df[date_col].dt.dayofweek
-        df["month"] = df[date_col].dt.month
-        df["year"] = df[date_col].dt.year
-        df2 = df[[amount_col, balance_col, "date", "year", "day", "dayofweek", "month"]].groupby(
-            ["date", "year", "month", "day", "dayofweek"]
-        ).agg({amount_col: "sum", balance_col: "min"}).reset_index()
-        df2["Month_end"] = df2["day"].apply(lambda x: 1 if x > 27 or x < 3 else 0)
-        df2["is_weekend"] = df2["dayofweek"].apply(lambda x: 1 if x >= 5 else 0)
-        df3 = df2
-        NGN_holidays = holidays.Nigeria()
-        df3['is_holiday'] = df3['date'].apply(lambda x: 1 if x in NGN_holidays else 0)
-        df3 = df3.drop(columns=["date", "day"])
-        df3['is_refill'] = df3[balance_col] > df3[balance_col].shift(1)
-        df3['refill_group'] = df3['is_refill'].cumsum()
-        grouped = df3.groupby('refill_group').agg({
-            amount_col: "sum",
-            "Month_end": "sum",
-            "is_weekend": "sum",
-            "is_holiday": "sum",
-            "dayofweek": "sum",
-            "year": "sum"
-        }).reset_index()
-        self.model_metadata["max_refill"] = grouped[amount_col].max()
+    @property
+    def trained_model(self):
+        return self.default_entry[0]
+
+    @property
+    def model_metadata(self):
+        return self.default_entry[1]
+
+    def train_model(self, csv_path: str, atm_id: str = None, n_jobs: int = -1, progress=None,
+                    search: str = "randomized", chunksize: int = INGEST_CHUNK_ROWS):
+        """
+        Train the stacking ensemble on a transaction CSV and register it.
+
+        search selects the hyperparameter search: "randomized" runs the three
+        50-candidate randomized searches one after another; "fast" runs
+        successive halving (with XGBoost early stopping) for all three base
+        learners at once, warm-started from the ATM's previous best
+        parameters. n_jobs caps the cores used by either search. progress,
+        if given, is called as progress(stage, completed_stages, total_stages)
+        as each search and the final fit start, and once more when done.
+        The CSV is streamed chunksize rows at a time into daily aggregates,
+        which are cached by content hash for later retrains.
+        """
+        if search not in ("randomized", "fast"):
+            raise ValueError("search must be 'randomized' or 'fast'")
+        path = resolve_csv_path(csv_path)
+        column_names = detect_columns(path)
+        daily, data_digest = load_daily_aggregates(path, column_names, chunksize=chunksize)
+        return self._train_from_daily(daily, column_names, data_digest, atm_id, n_jobs, progress, search)
+
+    def _train_from_daily(self, daily, column_names, data_digest, atm_id, n_jobs, progress, search):
+        report = progress or (lambda stage, completed, total: None)
+        metadata = {"max_refill": None, "column_names": column_names, "data_digest": data_digest}
+        amount_col, balance_col = column_names["amount"], column_names["balance"]
+        metadata["max_refill"], metadata["refill_state"] = self._refill_metadata(daily, amount_col, balance_col)
+        metadata["year_range"] = [int(daily["date"].iloc[0].year), int(daily["date"].iloc[-1].year)]
+        df3 = daily.drop(columns=["date", "day"])
         df4 = df3[df3[balance_col] != 0]
         df5 = df4[[amount_col, "Month_end", "is_weekend", "is_holiday", "month", "dayofweek", "year"]]
-        X = df5[["month", "Month_end", "is_weekend", "is_holiday", "dayofweek", "year"]]
+        X = df5[FEATURE_COLUMNS]
         y = df5[amount_col]
         x_train, x_test, y_train, y_test = train_test_split(
             X, y, test_size=0.25, shuffle=True, random_state=42
         )
-        xgb_param_grid = {
-            'n_estimators': [100, 200, 300, 400, 500],
-            'max_depth': [3, 5, 7, 9],
-            'learning_rate': [0.01, 0.05, 0.1, 0.2],
-            'subsample': [0.6, 0.8, 1.0],
-            'colsample_bytree': [0.6, 0.8, 1.0],
-            'gamma': [0, 0.1, 0.2],
-            'min_child_weight': [1, 3, 5]
+        key = self.registry.resolve(atm_id)
+        if search == "fast":
+            previous = self.registry.get(key)
+            previous_params = previous[1].get("best_params") if previous else None
+            best = self._fast_search(x_train, y_train, n_jobs, previous_params or {}, report)
+        else:
+            best = self._randomized_search(x_train, y_train, n_jobs, report)
+        metadata["best_params"] = {name: params for name, (_, params, _) in best.items()}
+        metadata["search_mse"] = {name: mse for name, (_, _, mse) in best.items()}
+        base_learners = [(name, estimator) for name, (estimator, _, _) in best.items()]
+        stacking = StackingRegressor(
+            estimators=base_learners,
+            final_estimator=LinearRegression()
+        )
+        report("stacking_fit", 3, 4)
+        stacking.fit(X, y)
+        # Base learners were refit on the training split only, so x_test is held out for them
+        base_test_preds = np.column_stack([estimator.predict(x_test) for _, estimator in base_learners])
+        test_preds = stacking.final_estimator_.predict(base_test_preds)
+        metadata["test_mse"] = float(np.mean((y_test.to_numpy() - test_preds) ** 2))
+        metadata["residuals"] = (y_test.to_numpy() - test_preds)[-RESIDUAL_SAMPLE_SIZE:].tolist()
+        version = self._publish(key, atm_id, stacking, metadata)
+        report("done", 4, 4)
+        return {
+            "message": "Model trained successfully",
+            "max_refill_amount": metadata["max_refill"],
+            "columns_used": metadata["column_names"],
+            "model_version": version
+        }
+
+    def _refill_metadata(self, daily, amount_col, balance_col):
+        grouped = refill_statistics(daily, amount_col, balance_col)
+        refill_state = {
+            "last_date": daily["date"].iloc[-1].strftime('%Y-%m-%d'),
+            "last_balance": daily[balance_col].iloc[-1],
+            "open_group_total": grouped[amount_col].iloc[-1]
         }
-        xgb = XGBRegressor(random_state=42)
+        return grouped[amount_col].max(), refill_state
+
+    def update_model(self, csv_path: str, atm_id: str = None, n_jobs: int = -1, progress=None,
+                     search: str = "fast", drift_threshold: float = DRIFT_THRESHOLD,
+                     chunksize: int = INGEST_CHUNK_ROWS):
+        """
+        Fold a CSV of new transactions into an existing model.
+
+        The new days are appended to the model's cached daily aggregates and
+        max_refill is advanced from the stored refill-group state. If the
+        model's error on the new days exceeds drift_threshold times its
+        held-out test error, it is fully retrained on the merged history with
+        the given search. Otherwise XGBoost continues boosting on the merged
+        history, Ridge is refit on it, and the RandomForest and final weights
+        are kept.
+        """
+        key = self.registry.resolve(atm_id)
+        # The served model may be compiled; refreshing needs the fitted estimators
+        entry = self.registry.load(key)
+        if not entry:
+            raise ValueError("Model not trained. Please train first.")
+        model, metadata = entry
+        column_names = metadata["column_names"]
+        amount_col, balance_col = column_names["amount"], column_names["balance"]
+        path = resolve_csv_path(csv_path)
+        new_daily = add_calendar_features(read_daily_aggregates(path, column_names, chunksize=chunksize), "date")
+        merged = append_daily_aggregates(read_cached_daily_aggregates(metadata["data_digest"]), new_daily, column_names)
+        data_digest = hashlib.sha256(f"{metadata['data_digest']}:{file_digest(path)}".encode()).hexdigest()
+        save_daily_aggregates(merged, data_digest)
+
+        new_rows = new_daily[new_daily[balance_col] != 0]
+        drift_ratio = None
+        if len(new_rows):
+            new_preds = model.predict(new_rows[FEATURE_COLUMNS])
+        if len(new_rows) and metadata.get("test_mse"):
+            drift_ratio = float(np.mean((new_rows[amount_col].to_numpy() - new_preds) ** 2) / metadata["test_mse"])
+        if drift_ratio is not None and drift_ratio > drift_threshold:
+            result = self._train_from_daily(merged, column_names, data_digest, atm_id, n_jobs, progress, search)
+            return {**result, "days_added": len(new_daily), "drift_ratio": drift_ratio, "full_retrain": True}
+
+        updated_metadata = {**metadata, "data_digest": data_digest}
+        updated_metadata["year_range"] = [int(merged["date"].iloc[0].year), int(merged["date"].iloc[-1].year)]
+        if len(new_rows) and "residuals" in metadata:
+            # The previous model never saw the new days, so its errors on them are out-of-sample too
+            new_residuals = (new_rows[amount_col].to_numpy() - new_preds).tolist()
+            updated_metadata["residuals"] = (metadata["residuals"] + new_residuals)[-RESIDUAL_SAMPLE_SIZE:]
+        if new_daily["date"].iloc[0] > pd.Timestamp(metadata["refill_state"]["last_date"]):
+            updated_metadata["refill_state"], updated_metadata["max_refill"] = update_refill_state(
+                metadata["refill_state"], metadata["max_refill"], new_daily, amount_col, balance_col
+            )
+        else:
+            # The new days overlap the history, so rebuild the refill groups from the merged days
+            updated_metadata["max_refill"], updated_metadata["refill_state"] = self._refill_metadata(
+                merged, amount_col, balance_col
+            )
+        updated_model = model
+        if len(new_rows):
+            merged_rows = merged[merged[balance_col] != 0]
+            updated_model = self._refresh_model(model, new_rows, merged_rows, amount_col)
+        version = self._publish(key, atm_id, updated_model, updated_metadata)
+        return {
+            "message": "Model updated incrementally",
+            "max_refill_amount": updated_metadata["max_refill"],
+            "columns_used": column_names,
+            "model_version": version,
+            "days_added": len(new_daily),
+            "drift_ratio": drift_ratio,
+            "full_retrain": False
+        }
+
+    def _refresh_model(self, model, new_rows, all_rows, amount_col):
+        """
+        Return a copy of a fitted stacking ensemble with Ridge refit on
+        all_rows and XGBoost boosted for a few more rounds on all_rows.
+
+        The extra rounds scale with the share of new rows in all_rows (up to
+        INCREMENTAL_BOOST_ROUNDS), so a few new days nudge the booster
+        instead of pulling it toward them while the final weights stay fixed.
+        """
+        rounds = max(1, int(np.ceil(INCREMENTAL_BOOST_ROUNDS * len(new_rows) / len(all_rows))))
+        refreshed = []
+        for name, estimator in model.named_estimators_.items():
+            if isinstance(estimator, XGBRegressor):
+                booster = estimator.get_booster()
+                estimator = copy.copy(estimator)
+                estimator.set_params(n_estimators=rounds, early_stopping_rounds=None)
+                # xgb_model copies the booster before boosting continues
+                estimator.fit(all_rows[FEATURE_COLUMNS], all_rows[amount_col], xgb_model=booster, verbose=False)
+            elif isinstance(estimator, Ridge):
+                estimator = clone(estimator).fit(all_rows[FEATURE_COLUMNS], all_rows[amount_col])
+            refreshed.append((name, estimator))
+        updated = copy.copy(model)
+        updated.estimators_ = [estimator for _, estimator in refreshed]
+        updated.named_estimators_ = Bunch(**dict(refreshed))
+        return updated
+
+    def _randomized_search(self, x_train, y_train, n_jobs, report):
+        """
+        Run the XGBoost, RandomForest and Ridge randomized searches one after another.
+
+        The searches run n_jobs candidate fits at once in worker processes,
+        so each estimator is pinned to one thread to stay inside n_jobs cores.
+        """
+        best = {}
+        report("xgb_search", 0, 4)
+        xgb = XGBRegressor(random_state=42, n_jobs=1)
         xgb_search = RandomizedSearchCV(
-            xgb, xgb_param_grid, n_iter=50, scoring='neg_mean_squared_error',
-            cv=5, verbose=1, random_state=42, n_jobs=-1
+            xgb, XGB_PARAM_GRID, n_iter=50, scoring='neg_mean_squared_error',
+            cv=5, verbose=1, random_state=42, n_jobs=n_jobs
         )
         xgb_search.fit(x_train, y_train)
-        best_xgb = xgb_search.best_estimator_
-        rf_param_grid = {
-            'n_estimators': [100, 200, 300, 400, 500],
-            'max_depth': [None, 5, 10, 20, 30],
-            'min_samples_split': [2, 5, 10],
-            'min_samples_leaf': [1, 2, 4],
-            'max_features': ['auto', 'sqrt', 'log2'],
-            'bootstrap': [True, False]
-        }
-        rf = RandomForestRegressor(random_state=42)
+        best["xgb"] = (xgb_search.best_estimator_, xgb_search.best_params_, -xgb_search.best_score_)
+        report("rf_search", 1, 4)
+        rf = RandomForestRegressor(random_state=42, n_jobs=1)
         rf_search = RandomizedSearchCV(
-            rf, rf_param_grid, n_iter=50, scoring='neg_mean_squared_error',
-            cv=5, verbose=1, random_state=42, n_jobs=-1
+            rf, RF_PARAM_GRID, n_iter=50, scoring='neg_mean_squared_error',
+            cv=5, verbose=1, random_state=42, n_jobs=n_jobs
         )
         rf_search.fit(x_train, y_train)
-        best_rf = rf_search.best_estimator_
-        ridge_param_grid = {
-            'alpha': loguniform(1e-4, 100),
-            'fit_intercept': [True, False],
-            'solver': ['auto', 'svd', 'cholesky', 'lsqr', 'sparse_cg', 'sag', 'saga'],
-            'max_iter': [100, 500, 1000, 2000],
-            'tol': [1e-4, 1e-3, 1e-2]
-        }
+        best["rf"] = (rf_search.best_estimator_, rf_search.best_params_, -rf_search.best_score_)
+        report("ridge_search", 2, 4)
         ridge = Ridge(random_state=42)
         ridge_search = RandomizedSearchCV(
-            ridge, ridge_param_grid, n_iter=50, scoring='neg_mean_squared_error',
-            cv=5, verbose=1, random_state=42, n_jobs=-1
+            ridge, RIDGE_PARAM_GRID, n_iter=50, scoring='neg_mean_squared_error',
+            cv=5, verbose=1, random_state=42, n_jobs=n_jobs
         )
         ridge_search.fit(x_train, y_train)
-        best_ridge = ridge_search.best_estimator_
-        base_learners = [
-            ("xgb", best_xgb),
-            ("rf", best_rf),
-            ("ridge", best_ridge)
-        ]
-        stacking = StackingRegressor(
-            estimators=base_learners,
-            final_estimator=LinearRegression()
+        best["ridge"] = (ridge_search.best_estimator_, ridge_search.best_params_, -ridge_search.best_score_)
+        return best
+
+    def _fast_search(self, x_train, y_train, n_jobs, previous_params, report):
+        """
+        Run the three base-learner searches concurrently under one core budget.
+
+        The tree models use successive halving: XGBoost over training samples
+        with early stopping choosing n_estimators, RandomForest over
+        n_estimators itself. Parallelism lives in the estimators (XGBoost and
+        forest threads) rather than in the searches, so the concurrent
+        searches share the budget without competing process pools.
+        """
+        report("base_learner_searches", 0, 4)
+        cores = effective_n_jobs(n_jobs)
+        tree_cores = max(1, (cores - 1) // 2)
+        x_fit, x_val, y_fit, y_val = train_test_split(
+            x_train, y_train, test_size=0.15, shuffle=True, random_state=42
         )
-        stacking.fit(X, y)
-        self.trained_model = stacking
+        xgb_grid = {name: values for name, values in XGB_PARAM_GRID.items() if name != "n_estimators"}
+        xgb = XGBRegressor(
+            random_state=42, n_estimators=max(XGB_PARAM_GRID["n_estimators"]),
+            early_stopping_rounds=20, n_jobs=tree_cores
+        )
+        xgb_search = HalvingRandomSearchCV(
+            xgb, _neighbourhood(xgb_grid, previous_params.get("xgb")), n_candidates=50, factor=3,
+            scoring='neg_mean_squared_error', cv=5, random_state=42, n_jobs=1
+        )
+        rf_grid = {name: values for name, values in RF_PARAM_GRID.items() if name != "n_estimators"}
+        rf = RandomForestRegressor(random_state=42, n_jobs=tree_cores)
+        rf_search = HalvingRandomSearchCV(
+            rf, _neighbourhood(rf_grid, previous_params.get("rf")), n_candidates=50, factor=3,
+            resource="n_estimators", min_resources=50, max_resources=max(RF_PARAM_GRID["n_estimators"]),
+            scoring='neg_mean_squared_error', cv=5, random_state=42, n_jobs=1
+        )
+        ridge = Ridge(random_state=42)
+        ridge_search = RandomizedSearchCV(
+            ridge, _neighbourhood(RIDGE_PARAM_GRID, previous_params.get("ridge")), n_iter=50,
+            scoring='neg_mean_squared_error', cv=5, random_state=42, n_jobs=1
+        )
+        with ThreadPoolExecutor(max_workers=3) as pool:
+            fits = [
+                pool.submit(xgb_search.fit, x_fit, y_fit, eval_set=[(x_val, y_val)], verbose=False),
+                pool.submit(rf_search.fit, x_train, y_train),
+                pool.submit(ridge_search.fit, x_train, y_train)
+            ]
+            for fit in fits:
+                fit.result()
+        best_xgb = xgb_search.best_estimator_
+        # Fix the boosting rounds found by early stopping so the stacking refit needs no eval_set
+        best_xgb.set_params(n_estimators=best_xgb.best_iteration + 1, early_stopping_rounds=None)
+        xgb_params = {**xgb_search.best_params_, "n_estimators": best_xgb.best_iteration + 1}
+        rf_params = {**rf_search.best_params_, "n_estimators": rf_search.best_estimator_.n_estimators}
         return {
-            "message": "Model trained successfully",
-            "max_refill_amount": self.model_metadata["max_refill"],
-            "columns_used": self.model_metadata["column_names"]
+            "xgb": (best_xgb, xgb_params, -xgb_search.best_score_),
+            "rf": (rf_search.best_estimator_, rf_params, -rf_search.best_score_),
+            "ridge": (ridge_search.best_estimator_, ridge_search.best_params_, -ridge_search.best_score_)
         }
 
-    def predict_refill(self, current_date: str, days: int):
-        if not self.trained_model:
-            raise ValueError("Model not trained. Please train first.")
-        current_date = pd.to_datetime(current_date)
-        date_range = pd.date_range(start=current_date, periods=365)
-        pred_df = pd.DataFrame({'date': date_range})
-        pred_df['day'] = pred_df['date'].dt.day
-        pred_df['month'] = pred_df['date'].dt.month
-        pred_df['year'] = pred_df['date'].dt.year
-        pred_df['dayofweek'] = pred_df['date'].dt.dayofweek
-        pred_df['Month_end'] = pred_df['day'].apply(lambda x: 1 if x > 27 or x < 3 else 0)
-        pred_df['is_weekend'] = pred_df['dayofweek'].apply(lambda x: 1 if x >= 5 else 0)
-        NGN_holidays = holidays.Nigeria()
-        pred_df['is_holiday'] = pred_df['date'].apply(lambda x: 1 if x in NGN_holidays else 0)
-        pred_df = pred_df.drop(columns=["date", "day"])
-        predictions = []
-        total = 0
-        for day in range(days):
-            daily_pred = float(self.trained_model.predict(pred_df.iloc[[day]][["month", "Month_end", "is_weekend", "is_holiday", "dayofweek", "year"]])[0])
-            total += daily_pred
-            predictions.append({
+    def _publish(self, key: str, atm_id: str, model, metadata: dict) -> str:
+        """
+        Register a new model version with its forecast table, swap it in and
+        drop forecasts of the old one.
+        """
+        first_year, last_year = metadata["year_range"]
+        table = ForecastTable.build(model, first_year, last_year + FORECAST_TABLE_YEARS_AHEAD)
+        version = self.registry.register(key, model, metadata, table)
+        if atm_id is None:
+            # Serve whatever the registry serves (the compiled model when available)
+            self.default_entry = self.registry.get(key)
+        self.forecast_cache.invalidate(key)
+        return version
+
+    def reload_model(self, atm_id: str = None):
+        """Swap in the latest artifact on disk for atm_id (or the default model)."""
+        key = self.registry.resolve(atm_id)
+        self.registry.evict(key)
+        entry = self.registry.get(key)
+        if entry and atm_id is None:
+            self.default_entry = entry
+        self.forecast_cache.invalidate(key)
+        return entry
+
+    def refresh_models(self):
+        """
+        Serve models other processes published since the last call, such as
+        training jobs finished by another API worker. Returns the model keys
+        that changed.
+        """
+        changed = self.registry.refresh()
+        default_key = self.registry.resolve(None)
+        entry = self.registry.get(default_key)
+        if entry and entry[1].get("version") != self.model_metadata.get("version"):
+            self.default_entry = entry
+            changed = sorted(set(changed) | {default_key})
+        for key in changed:
+            self.forecast_cache.invalidate(key)
+        return changed
+
+    def _entry_for(self, atm_id: str = None):
+        """(model key, model, metadata) serving atm_id."""
+        # ATMs without a model of their own (or of their cluster) fall back to the default model
+        if atm_id is not None:
+            key = self.registry.resolve(atm_id)
+            entry = self.registry.get(key)
+            if entry:
+                return key, entry[0], entry[1]
+        model, metadata = self.default_entry
+        return self.registry.resolve(None), model, metadata
+
+    def _forecast_result(self, current_date, days: int, date_range, daily_preds):
+        running_totals = np.cumsum(daily_preds)
+        total = float(running_totals[-1]) if days > 0 else 0
+        predictions = [
+            {
                 "day_number": day + 1,
-                "date": date_range[day].strftime('%Y-%m-%d'),
-                "predicted_withdrawal": daily_pred,
-                "running_total": total
-            })
+                "date": date.strftime('%Y-%m-%d'),
+                "predicted_withdrawal": float(daily_pred),
+                "running_total": float(running_total)
+            }
+            for day, (date, daily_pred, running_total) in enumerate(zip(date_range, daily_preds, running_totals))
+        ]
         return {
             "total_predicted_amount": total,
             "message": f"{total} would be sufficient for {days} days",
@@ -163,3 +431,150 @@ class ModelService:
             "prediction_date": current_date.strftime('%Y-%m-%d'),
             "days_requested": days
         }
+
+    @staticmethod
+    def _check_days(days: int):
+        if days < 0:
+            raise ValueError("days must not be negative")
+
+    def _predict_dates(self, model, dates) -> np.ndarray:
+        # Tabulated models gather straight from the dates' feature codes
+        if hasattr(model, "predict_dates"):
+            return model.predict_dates(dates).astype(float)
+        return model.predict(build_features(dates)).astype(float)
+
+    def _daily_predictions(self, key, model, metadata, current_date, days: int):
+        version, start = metadata.get("version"), current_date.strftime('%Y-%m-%d')
+        daily_preds = self.forecast_cache.get(version, key, start, days) if version else None
+        if daily_preds is None:
+            # Score the whole horizon in one pass instead of one predict call per day
+            date_range = pd.date_range(start=current_date, periods=days)
+            daily_preds = self._predict_dates(model, date_range.values) if days > 0 else np.empty(0)
+            if version and days > 0:
+                self.forecast_cache.put(version, key, start, daily_preds)
+        return daily_preds
+
+    def predict_refill(self, current_date: str, days: int, atm_id: str = None):
+        self._check_days(days)
+        key, model, metadata = self._entry_for(atm_id)
+        if not model:
+            raise ValueError("Model not trained. Please train first.")
+        current_date = pd.to_datetime(current_date)
+        date_range = pd.date_range(start=current_date, periods=days)
+        daily_preds = self._daily_predictions(key, model, metadata, current_date, days)
+        return self._forecast_result(current_date, days, date_range, daily_preds)
+
+    def predict_refill_distribution(self, current_date: str, days: int, atm_id: str = None,
+                                    loaded_amount: float = None, n_paths: int = MONTE_CARLO_PATHS,
+                                    seed: int = None):
+        """
+        Probabilistic forecast by residual bootstrap.
+
+        n_paths withdrawal paths are simulated at once as the point forecast
+        plus residuals drawn from the model's held-out errors, as one
+        (n_paths, days) array. Returns per-day P50/P90/P99 of the daily
+        withdrawal and of the running total and, when loaded_amount is
+        given, the probability that the ATM has run out by each day.
+        """
+        self._check_days(days)
+        key, model, metadata = self._entry_for(atm_id)
+        if not model:
+            raise ValueError("Model not trained. Please train first.")
+        if not metadata.get("residuals"):
+            raise ValueError("Model has no residuals for probabilistic forecasts. Please retrain.")
+        current_date = pd.to_datetime(current_date)
+        date_range = pd.date_range(start=current_date, periods=days)
+        daily_preds = self._daily_predictions(key, model, metadata, current_date, days)
+        residuals = np.asarray(metadata["residuals"], dtype=float)
+        rng = np.random.default_rng(seed)
+        paths = np.clip(daily_preds + rng.choice(residuals, size=(n_paths, days)), 0, None)
+        running_totals = np.cumsum(paths, axis=1)
+        daily_quantiles = np.quantile(paths, FORECAST_QUANTILES, axis=0)
+        total_quantiles = np.quantile(running_totals, FORECAST_QUANTILES, axis=0)
+        stockout = (running_totals > loaded_amount).mean(axis=0) if loaded_amount is not None else None
+
+        result = self._forecast_result(current_date, days, date_range, daily_preds)
+        labels = [f"p{round(q * 100)}" for q in FORECAST_QUANTILES]
+        for day, prediction in enumerate(result["daily_predictions"]):
+            for label, daily_q, total_q in zip(labels, daily_quantiles, total_quantiles):
+                prediction[f"withdrawal_{label}"] = float(daily_q[day])
+                prediction[f"running_total_{label}"] = float(total_q[day])
+            if stockout is not None:
+                prediction["stockout_probability"] = float(stockout[day])
+        if days > 0:
+            result.update({f"total_{label}": float(total_q[-1]) for label, total_q in zip(labels, total_quantiles)})
+        result["paths"] = n_paths
+        if stockout is not None:
+            result["loaded_amount"] = loaded_amount
+            result["stockout_probability"] = float(stockout[-1]) if days > 0 else 0.0
+        return result
+
+    def _batch_predictions(self, requests):
+        """
+        Yield (index, atm_id, current_date, days, date_range, daily
+        predictions) for (atm_id, current_date, days) tuples, grouped by
+        serving model; index is the request's position in requests.
+
+        Requests already in the forecast cache are answered from it; feature
+        rows for the rest of the requests served by the same model are
+        stacked and scored in a single predict call.
+        """
+        batches = {}
+        for index, (atm_id, current_date, days) in enumerate(requests):
+            self._check_days(days)
+            key, model, metadata = self._entry_for(atm_id)
+            if not model:
+                raise ValueError(f"Model not trained for ATM {atm_id}. Please train first.")
+            batches.setdefault(key, (model, metadata.get("version"), []))[2].append(
+                (index, atm_id, pd.to_datetime(current_date), int(days))
+            )
+        for key, (model, version, items) in batches.items():
+            date_ranges = [pd.date_range(start=current_date, periods=days) for _, _, current_date, days in items]
+            cached = [
+                self.forecast_cache.get(version, key, current_date.strftime('%Y-%m-%d'), days) if version else None
+                for _, _, current_date, days in items
+            ]
+            misses = [i for i, preds in enumerate(cached) if preds is None and items[i][3] > 0]
+            if misses:
+                all_preds = self._predict_dates(model, np.concatenate([date_ranges[i].values for i in misses]))
+                offsets = np.cumsum([0] + [items[i][3] for i in misses])
+                for i, start, end in zip(misses, offsets[:-1], offsets[1:]):
+                    cached[i] = all_preds[start:end]
+                    if version:
+                        self.forecast_cache.put(version, key, items[i][2].strftime('%Y-%m-%d'), cached[i])
+            for (index, atm_id, current_date, days), date_range, daily_preds in zip(items, date_ranges, cached):
+                if daily_preds is None:
+                    daily_preds = np.empty(0)
+                yield index, atm_id, current_date, days, date_range, daily_preds
+
+    def predict_refill_batch(self, requests):
+        """
+        Forecast many ATMs at once from (atm_id, current_date, days) tuples.
+
+        Results are yielded per ATM as soon as their model's batch has been
+        scored (see _batch_predictions), grouped by model rather than in
+        request order; each carries its request's position as index.
+        """
+        for index, atm_id, current_date, days, date_range, daily_preds in self._batch_predictions(requests):
+            yield {"index": index, "atm_id": atm_id,
+                   **self._forecast_result(current_date, days, date_range, daily_preds)}
+
+    def predict_refill_many(self, requests) -> list:
+        """Like predict_refill_batch, but returns the results as a list in request order."""
+        results = [None] * len(requests)
+        for index, atm_id, current_date, days, date_range, daily_preds in self._batch_predictions(requests):
+            results[index] = {"atm_id": atm_id, **self._forecast_result(current_date, days, date_range, daily_preds)}
+        return results
+
+    def forecast_matrix(self, atm_ids, current_date: str, days: int) -> np.ndarray:
+        """Daily predictions as an (ATMs, days) array, rows in the order of atm_ids."""
+        requests = [(atm_id, current_date, days) for atm_id in atm_ids]
+        matrix = np.zeros((len(requests), days))
+        for index, _, _, _, _, daily_preds in self._batch_predictions(requests):
+            matrix[index] = daily_preds
+        return matrix
+
+    def refill_limit(self, atm_id: str = None):
+        """Largest amount withdrawn between two refills in atm_id's training history (max_refill)."""
+        _, model, metadata = self._entry_for(atm_id)
+        return metadata.get("max_refill") if model else None
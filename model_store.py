@@ -0,0 +1,187 @@
+import copy
+import json
+import os
+import re
+import shutil
+from datetime import datetime, timezone
+from pathlib import Path
+import joblib
+import numpy as np
+from sklearn.base import clone
+from sklearn.utils import Bunch
+from xgboost import Booster, XGBRegressor
+from compact_model import CompactModel, compile_model
+from forecast_table import ForecastTable
+
+KEEP_VERSIONS = int(os.getenv("MODEL_KEEP_VERSIONS", "3"))
+# Keys become directory names, versions are UTC timestamps
+KEY_PATTERN = re.compile(r"[A-Za-z0-9_-]+")
+VERSION_PATTERN = re.compile(r"\d{8}T\d{12}")
+
+# Versioned model artifacts, one directory per model key:
+#
+#   <model_dir>/<key>/LATEST                  name of the newest version
+#   <model_dir>/<key>/<version>/model.joblib  stacking ensemble, uncompressed so arrays can be memory-mapped
+#   <model_dir>/<key>/<version>/xgb_<name>.ubj  XGBoost boosters in their native format
+#   <model_dir>/<key>/<version>/compact.npz   the ensemble compiled to NumPy arrays (see compact_model)
+#   <model_dir>/<key>/<version>/table.npz     predictions over the whole feature space (see forecast_table)
+#   <model_dir>/<key>/<version>/metadata.json model_metadata
+#
+# plus <model_dir>/clusters.json, the ATM ID -> model key assignments.
+
+
+def validate_key(key: str) -> str:
+    """Reject model keys that are not a plain directory name (no dots, slashes or separators)."""
+    if not isinstance(key, str) or not KEY_PATTERN.fullmatch(key):
+        raise ValueError(f"Invalid model key: {key!r}")
+    return key
+
+
+def _key_dir(model_dir, key: str) -> Path:
+    return Path(model_dir) / validate_key(key)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    raise TypeError(f"Cannot serialize {type(value).__name__}")
+
+
+def _detach_boosters(model):
+    """
+    Return a shallow copy of a fitted StackingRegressor that can be pickled
+    without its XGBoost boosters, plus the boosters keyed by estimator name.
+    The live model is left untouched so it can keep serving predictions.
+    """
+    boosters = {}
+    fitted = []
+    for name, estimator in model.named_estimators_.items():
+        if isinstance(estimator, XGBRegressor):
+            boosters[name] = estimator.get_booster()
+            estimator = copy.copy(estimator)
+            estimator.__dict__.pop("_Booster", None)
+        fitted.append((name, estimator))
+    detached = copy.copy(model)
+    # The unfitted templates only need their parameters, not the fitted search winners
+    detached.estimators = [(name, clone(estimator)) for name, estimator in model.estimators]
+    detached.estimators_ = [estimator for _, estimator in fitted]
+    detached.named_estimators_ = Bunch(**dict(fitted))
+    return detached, boosters
+
+
+def save_model(model_dir, key: str, model, metadata: dict, table: ForecastTable = None) -> str:
+    """Write a new version of the artifact for key and mark it as latest."""
+    key_dir = _key_dir(model_dir, key)
+    version = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    tmp_dir = key_dir / f".{version}.tmp"
+    tmp_dir.mkdir(parents=True)
+    try:
+        detached, boosters = _detach_boosters(model)
+        joblib.dump(detached, tmp_dir / "model.joblib")
+        for name, booster in boosters.items():
+            booster.save_model(str(tmp_dir / f"xgb_{name}.ubj"))
+        try:
+            compile_model(model).save(tmp_dir / "compact.npz")
+        except ValueError:
+            pass  # not a compilable ensemble; served through sklearn instead
+        if table is not None:
+            table.save(tmp_dir / "table.npz")
+        with open(tmp_dir / "metadata.json", "w") as f:
+            json.dump({**metadata, "version": version}, f, default=_json_default)
+        os.rename(tmp_dir, key_dir / version)
+    except Exception:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+    latest_tmp = key_dir / "LATEST.tmp"
+    latest_tmp.write_text(version)
+    os.replace(latest_tmp, key_dir / "LATEST")
+    _prune(key_dir, version)
+    return version
+
+
+def latest_version(model_dir, key: str):
+    latest = _key_dir(model_dir, key) / "LATEST"
+    if not latest.exists():
+        return None
+    return latest.read_text().strip()
+
+
+def load_model(model_dir, key: str, version: str = None):
+    """
+    Load (model, metadata) for key, defaulting to the latest version.
+
+    Arrays in the joblib file are memory-mapped read-only, so workers loading
+    the same version share the underlying pages through the OS page cache.
+    Returns None when no artifact exists.
+    """
+    version = version or latest_version(model_dir, key)
+    if version is None:
+        return None
+    version_dir = _key_dir(model_dir, key) / version
+    model = joblib.load(version_dir / "model.joblib", mmap_mode="r")
+    for name, estimator in model.named_estimators_.items():
+        booster_path = version_dir / f"xgb_{name}.ubj"
+        if isinstance(estimator, XGBRegressor) and booster_path.exists():
+            booster = Booster()
+            booster.load_model(str(booster_path))
+            estimator._Booster = booster
+    with open(version_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    return model, metadata
+
+
+def load_compact_model(model_dir, key: str, version: str = None):
+    """Load (CompactModel, metadata) for key, or None when the version has no compact artifact."""
+    version = version or latest_version(model_dir, key)
+    if version is None:
+        return None
+    version_dir = _key_dir(model_dir, key) / version
+    if not (version_dir / "compact.npz").exists():
+        return None
+    with open(version_dir / "metadata.json") as f:
+        metadata = json.load(f)
+    return CompactModel.load(version_dir / "compact.npz"), metadata
+
+
+def load_table(model_dir, key: str, version: str):
+    path = _key_dir(model_dir, key) / version / "table.npz"
+    return ForecastTable.load(path) if path.exists() else None
+
+
+def compact_size(model_dir, key: str, version: str) -> int:
+    return (_key_dir(model_dir, key) / version / "compact.npz").stat().st_size
+
+
+def artifact_size(model_dir, key: str, version: str = None) -> int:
+    version = version or latest_version(model_dir, key)
+    if version is None:
+        return 0
+    version_dir = _key_dir(model_dir, key) / version
+    return sum(p.stat().st_size for p in version_dir.iterdir() if p.is_file())
+
+
+def load_clusters(model_dir) -> dict:
+    path = Path(model_dir) / "clusters.json"
+    if not path.exists():
+        return {}
+    with open(path) as f:
+        return json.load(f)
+
+
+def save_clusters(model_dir, clusters: dict):
+    path = Path(model_dir) / "clusters.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(".tmp")
+    with open(tmp_path, "w") as f:
+        json.dump(clusters, f)
+    os.replace(tmp_path, path)
+
+
+def _prune(key_dir: Path, current: str):
+    # Only ever delete directories this module created
+    versions = sorted(p.name for p in key_dir.iterdir() if p.is_dir() and VERSION_PATTERN.fullmatch(p.name))
+    for version in versions[:-KEEP_VERSIONS]:
+        if version != current:
+            shutil.rmtree(key_dir / version, ignore_errors=True)
@@ -34,6 +34,9 @@ class RefillRequestAction(BaseModel):
     action: str  # "approve" or "refuse"
     comment: Optional[str] = None
 
+class BulkRefillRequestAction(RefillRequestAction):
+    request_id: str
+
 class User(BaseModel):
     username: str
     role: str
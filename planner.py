@@ -0,0 +1,126 @@
+import os
+import numpy as np
+import pandas as pd
+
+REFILL_VISIT_COST = float(os.getenv("REFILL_VISIT_COST", "50000"))
+# Cost of keeping one unit of cash in an ATM for one day
+CASH_HOLDING_RATE = float(os.getenv("CASH_HOLDING_RATE", "0.0005"))
+# Cost per unit of forecast demand an ATM cannot serve
+STOCKOUT_PENALTY = float(os.getenv("STOCKOUT_PENALTY", "1.0"))
+# Extra cash loaded on top of the forecast demand a refill covers
+REFILL_SAFETY_FACTOR = float(os.getenv("REFILL_SAFETY_FACTOR", "0.1"))
+PLAN_HORIZON_DAYS = int(os.getenv("PLAN_HORIZON_DAYS", "30"))
+
+
+def uncovered_demand(demand: np.ndarray, balances: np.ndarray) -> np.ndarray:
+    """Daily demand left once each ATM's current balance has been used up."""
+    remaining = balances[:, None] - (np.cumsum(demand, axis=1) - demand)
+    return np.clip(demand - np.clip(remaining, 0, None), 0, None)
+
+
+def plan_refills(demand, balances, capacities, visit_cost: float = REFILL_VISIT_COST,
+                 holding_rate: float = CASH_HOLDING_RATE, stockout_penalty: float = STOCKOUT_PENALTY,
+                 safety_factor: float = REFILL_SAFETY_FACTOR):
+    """
+    Cheapest refill schedule for every ATM over the forecast horizon.
+
+    demand is an (ATMs, days) array of forecast withdrawals; balances and
+    capacities hold one value per ATM (or a scalar for all). A refill on
+    day i loads the demand of days i..j-1 plus the safety margin, so the
+    schedule is a partition of the horizon into intervals, solved by
+    dynamic programming over interval end days:
+
+        best[j] = min over i < j of best[i] + cost(i, j)
+
+    cost(i, j) is the visit cost plus the holding cost of the loaded cash
+    until it is withdrawn, from prefix sums of demand and day-weighted
+    demand. Intervals with no demand cost nothing (no visit), intervals
+    whose load exceeds capacity are only allowed for a single day, at the
+    stockout penalty for the shortfall. Each step is evaluated for all
+    ATMs and start days at once, so the work is O(days^2) array
+    operations regardless of fleet size.
+
+    Returns (loads, costs): loads[a, t] is the amount to load into ATM a
+    on day t (0 when there is no visit), costs[a] the plan's total cost.
+    """
+    demand = np.clip(np.asarray(demand, dtype=float), 0, None)
+    n_atms, horizon = demand.shape
+    balances = np.broadcast_to(np.asarray(balances, dtype=float), (n_atms,))
+    capacities = np.broadcast_to(np.asarray(capacities, dtype=float), (n_atms,))
+    need = uncovered_demand(demand, balances)
+
+    days = np.arange(horizon)
+    totals = np.zeros((n_atms, horizon + 1))
+    totals[:, 1:] = np.cumsum(need, axis=1)
+    weighted = np.zeros((n_atms, horizon + 1))
+    weighted[:, 1:] = np.cumsum(need * days, axis=1)
+
+    best = np.zeros((n_atms, horizon + 1))
+    choice = np.zeros((n_atms, horizon + 1), dtype=int)
+    rows = np.arange(n_atms)
+    for end in range(1, horizon + 1):
+        starts = days[:end]
+        amount = totals[:, [end]] - totals[:, :end]
+        # Sum over covered days of (day - refill day) * demand: cash-days held
+        held = weighted[:, [end]] - weighted[:, :end] - starts * amount
+        cost = visit_cost + holding_rate * (held + safety_factor * amount * (end - starts))
+        over_capacity = amount * (1 + safety_factor) > capacities[:, None]
+        shortfall = np.clip(amount - capacities[:, None], 0, None)
+        cost = np.where(
+            over_capacity,
+            np.where(starts == end - 1, visit_cost + stockout_penalty * shortfall, np.inf),
+            cost
+        )
+        cost = np.where(amount > 0, cost, 0.0)
+        candidates = best[:, :end] + cost
+        choice[:, end] = np.argmin(candidates, axis=1)
+        best[:, end] = candidates[rows, choice[:, end]]
+
+    # Walk the chosen intervals back from the last day, all ATMs at once
+    loads = np.zeros((n_atms, horizon))
+    end = np.full(n_atms, horizon)
+    while (end > 0).any():
+        active = end > 0
+        start = choice[rows, end]
+        amount = totals[rows, end] - totals[rows, start]
+        visit = active & (amount > 0)
+        loads[rows[visit], start[visit]] = np.minimum(amount * (1 + safety_factor), capacities)[visit]
+        end = np.where(active, start, 0)
+    return loads, best[:, horizon]
+
+
+def plan_fleet(model_service, atms, start_date: str, days: int = PLAN_HORIZON_DAYS, **costs):
+    """
+    Refill plans for a fleet from its forecasts.
+
+    atms are dicts with atm_id, balance and capacity (cassette capacity).
+    Each ATM's capacity is capped by the max_refill of the model serving
+    it. costs are passed through to plan_refills. Returns one plan per ATM,
+    in input order, with the scheduled refills and the plan's cost.
+    """
+    atm_ids = [atm["atm_id"] for atm in atms]
+    positions = {atm_id: i for i, atm_id in enumerate(dict.fromkeys(atm_ids))}
+    forecasts = model_service.forecast_matrix(list(positions), start_date, days)
+    demand = forecasts[[positions[atm_id] for atm_id in atm_ids]]
+
+    capacities = []
+    for atm in atms:
+        limit = model_service.refill_limit(atm["atm_id"])
+        capacities.append(min(atm["capacity"], limit) if limit else atm["capacity"])
+    loads, plan_costs = plan_refills(demand, [atm["balance"] for atm in atms], capacities, **costs)
+
+    dates = pd.date_range(start=pd.to_datetime(start_date), periods=days).strftime('%Y-%m-%d')
+    plans = []
+    for i, atm in enumerate(atms):
+        visit_days = np.flatnonzero(loads[i])
+        plans.append({
+            "atm_id": atm["atm_id"],
+            "capacity": float(capacities[i]),
+            "total_cost": float(plan_costs[i]),
+            "forecast_withdrawal": float(demand[i].sum()),
+            "refills": [
+                {"day_number": int(day) + 1, "date": dates[day], "amount": float(loads[i, day])}
+                for day in visit_days
+            ]
+        })
+    return plans
@@ -0,0 +1,100 @@
+import asyncio
+import os
+import time
+
+BATCH_WINDOW_MS = float(os.getenv("BATCH_WINDOW_MS", "5"))
+BATCH_MAX_SIZE = int(os.getenv("BATCH_MAX_SIZE", "256"))
+
+
+class PredictionBatcher:
+    """
+    Coalesces concurrent single-ATM forecast requests into batched predicts.
+
+    Requests arriving within window_ms of the first one in a batch (or
+    until max_batch_size are waiting) are handed to
+    ModelService.predict_refill_many together, in a worker thread, so their
+    feature rows are scored in one predict call per model instead of one
+    per request. Each awaiting coroutine gets its own result back. Must be
+    used from a single event loop.
+    """
+
+    def __init__(self, model_service, window_ms: float = BATCH_WINDOW_MS, max_batch_size: int = BATCH_MAX_SIZE):
+        self.model_service = model_service
+        self.window = window_ms / 1000
+        self.max_batch_size = max_batch_size
+        self._pending = []  # ((atm_id, current_date, days), future, queued at)
+        self._timer = None
+        self._tasks = set()
+        self.requests = 0
+        self.batches = 0
+        self.largest_batch = 0
+        self.in_flight = 0
+        self.total_wait = 0.0
+
+    async def predict(self, atm_id: str, current_date: str, days: int) -> dict:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append(((atm_id, current_date, days), future, time.perf_counter()))
+        self.requests += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.batches += 1
+        self.largest_batch = max(self.largest_batch, len(batch))
+        now = time.perf_counter()
+        self.total_wait += sum(now - queued_at for _, _, queued_at in batch)
+        task = asyncio.ensure_future(self._score(batch))
+        # Keep a reference so the task is not garbage collected mid-flight
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _score(self, batch):
+        self.in_flight += 1
+        try:
+            requests = [request for request, _, _ in batch]
+            try:
+                results = await asyncio.to_thread(self.model_service.predict_refill_many, requests)
+            except Exception:
+                # One bad request (untrained ATM, invalid horizon) must not fail the requests it was batched with
+                results = await asyncio.to_thread(self._score_individually, requests)
+        finally:
+            self.in_flight -= 1
+        for (_, future, _), result in zip(batch, results):
+            if future.done():
+                continue  # the caller went away
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    def _score_individually(self, requests):
+        results = []
+        for request in requests:
+            try:
+                results.extend(self.model_service.predict_refill_many([request]))
+            except Exception as e:
+                results.append(e)
+        return results
+
+    def stats(self):
+        return {
+            "queue_depth": len(self._pending),
+            "in_flight_batches": self.in_flight,
+            "requests": self.requests,
+            "batches": self.batches,
+            "avg_batch_size": (self.requests - len(self._pending)) / self.batches if self.batches else 0.0,
+            "max_batch_size": self.largest_batch,
+            "avg_wait_ms": 1000 * self.total_wait / (self.requests - len(self._pending)) if self.batches else 0.0,
+            "window_ms": self.window * 1000,
+            "batch_limit": self.max_batch_size
+        }
@@ -1,7 +1,32 @@
-from typing import List, Optional
+from typing import List, Optional, Tuple
 from datetime import datetime
 from models import RefillRequest, ApprovalRecord
+from database import DEFAULT_PAGE_SIZE
 from services_db import create_refill_request as db_create_refill_request, list_refill_requests as db_list_refill_requests, take_action_on_refill_request as db_take_action_on_refill_request
+from services_db import list_refill_requests_page as db_list_refill_requests_page, get_refill_request as db_get_refill_request
+
+def _to_refill_request(r: dict) -> RefillRequest:
+    approval_history = None
+    if 'approval_history' in r:
+        approval_history = [
+            ApprovalRecord(
+                approver=record['approver'],
+                role=record['role'],
+                action=record['action'],
+                timestamp=record['timestamp'],
+                comment=record.get('comment')
+            ) for record in r['approval_history']
+        ]
+    return RefillRequest(
+        request_id=r['request_id'],
+        atm_id=r['atm_id'],
+        requested_amount=r['requested_amount'],
+        requestor=r['requestor'],
+        status=r['status'],
+        created_at=r['created_at'],
+        updated_at=r['updated_at'],
+        approval_history=approval_history
+    )
 
 async def create_refill_request(atm_id: str, requested_amount: float, requestor: str, comment: str = None) -> RefillRequest:
     """
@@ -53,6 +78,19 @@ async def list_refill_requests(user_role: str, username: str, status_filter: str
         )
     return result
 
+async def list_refill_requests_page(user_role: str, username: str, status_filter: str = None, cursor: str = None,
+                                    page_size: int = DEFAULT_PAGE_SIZE, include_history: bool = True) -> Tuple[List[RefillRequest], Optional[str]]:
+    """
+    List one page of refill requests, returning the requests and the cursor of the next page
+    """
+    requests_db, next_cursor = await db_list_refill_requests_page(
+        user_role, username, status_filter, cursor, page_size, include_history
+    )
+
+    # Convert to RefillRequest objects
+    result = [_to_refill_request(r) for r in requests_db]
+    return result, next_cursor
+
 async def take_action_on_refill_request(request_id: str, action: str, approver: str, role: str, comment: str = None) -> RefillRequest:
     """
     Take action on a refill request
@@ -60,30 +98,16 @@ async def take_action_on_refill_request(request_id: str, action: str, approver:
     updated_request_db = await db_take_action_on_refill_request(request_id, action, approver, role, comment)
     
     # Get the complete request with approval history
-    requests_db = await db_list_refill_requests(role, approver, None)
-    complete_request_db = next((r for r in requests_db if r['request_id'] == request_id), None)
-    
+    complete_request_db = await db_get_refill_request(request_id)
+
     if not complete_request_db:
         raise ValueError("Refill request not found")
-    
-    # Convert to RefillRequest object
-    approval_history = [
-        ApprovalRecord(
-            approver=record['approver'],
-            role=record['role'],
-            action=record['action'],
-            timestamp=record['timestamp'],
-            comment=record.get('comment')
-        ) for record in complete_request_db.get('approval_history', [])
-    ]
-    
-    return RefillRequest(
-        request_id=complete_request_db['request_id'],
-        atm_id=complete_request_db['atm_id'],
-        requested_amount=complete_request_db['requested_amount'],
-        requestor=complete_request_db['requestor'],
-        status=complete_request_db['status'],
-        created_at=complete_request_db['created_at'],
-        updated_at=complete_request_db['updated_at'],
-        approval_history=approval_history
-    )
+
+    return _to_refill_request(complete_request_db)
+
+async def get_refill_request(request_id: str) -> Optional[RefillRequest]:
+    """
+    Get a single refill request with its approval history
+    """
+    request_db = await db_get_refill_request(request_id)
+    return _to_refill_request(request_db) if request_db else None
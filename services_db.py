@@ -1,7 +1,5 @@
 from datetime import datetime
-from database import get_supabase_client
-
-supabase = get_supabase_client()
+from database import DEFAULT_PAGE_SIZE, call_transition, execute, fetch_page, get_async_client
 
 async def create_refill_request(atm_id: str, requested_amount: float, requestor: str, comment: str = None):
     # Create the refill request
@@ -13,9 +11,8 @@ async def create_refill_request(atm_id: str, requested_amount: float, requestor:
         'created_at': datetime.utcnow().isoformat(),
         'updated_at': datetime.utcnow().isoformat()
     }
-    response = supabase.table('refillrequest').insert(data).execute()
-    if response.error:
-        raise Exception(f"Error creating refill request: {response.error.message}")
+    db = get_async_client()
+    response = await execute(db.table('refillrequest').insert(data), "creating refill request")
     new_request = response.data[0]
 
     # Create approval record if comment is provided
@@ -28,15 +25,13 @@ async def create_refill_request(atm_id: str, requested_amount: float, requestor:
             'comment': comment,
             'timestamp': datetime.utcnow().isoformat()
         }
-        approval_response = supabase.table('approvalrecord').insert(approval_data).execute()
-        if approval_response.error:
-            raise Exception(f"Error creating approval record: {approval_response.error.message}")
+        await execute(db.table('approvalrecord').insert(approval_data), "creating approval record")
 
     return new_request
 
-async def list_refill_requests(user_role: str, username: str, status_filter: str = None):
+def _refill_requests_query(user_role: str, username: str, status_filter: str = None, include_history: bool = True):
     # Build the query based on user role
-    query = supabase.table('refillrequest')
+    query = get_async_client().table('refillrequest').select('*, approval_history(*)' if include_history else '*')
 
     if user_role == "ATM Operations Staff":
         query = query.eq('requestor', username)
@@ -50,56 +45,35 @@ async def list_refill_requests(user_role: str, username: str, status_filter: str
 
     if status_filter:
         query = query.eq('status', status_filter)
+    return query
 
-    response = query.select('*, approval_history(*)').execute()
-    if response.error:
-        raise Exception(f"Error fetching refill requests: {response.error.message}")
+async def list_refill_requests(user_role: str, username: str, status_filter: str = None):
+    query = _refill_requests_query(user_role, username, status_filter)
+    response = await execute(query, "fetching refill requests")
     return response.data
 
+async def list_refill_requests_page(user_role: str, username: str, status_filter: str = None, cursor: str = None,
+                                    page_size: int = DEFAULT_PAGE_SIZE, include_history: bool = True):
+    query = _refill_requests_query(user_role, username, status_filter, include_history)
+    return await fetch_page(query, cursor, page_size, "fetching refill requests")
+
+async def get_refill_request(request_id: str, include_history: bool = True):
+    # Single indexed lookup by primary key, with the history embedded in the same round trip
+    query = get_async_client().table('refillrequest').select(
+        '*, approval_history(*)' if include_history else '*'
+    ).eq('request_id', request_id).limit(1)
+    response = await execute(query, "fetching refill request")
+    return response.data[0] if response.data else None
+
 async def take_action_on_refill_request(request_id: str, action: str, approver: str, role: str, comment: str = None):
-    # Check if refill request exists
-    response = supabase.table('refillrequest').select('*').eq('request_id', request_id).execute()
-    if response.error:
-        raise Exception(f"Error fetching refill request: {response.error.message}")
-    refill_request = response.data[0] if response.data else None
-    if not refill_request:
-        raise ValueError("Refill request not found")
-    if refill_request['status'] != "Pending":
-        raise ValueError("Refill request already processed")
     if action.lower() not in ["approve", "refuse"]:
         raise ValueError("Invalid action")
 
-    # Determine the new status based on action
-    status = "Approved" if action.lower() == "approve" else "Refused" if action.lower() == "refuse" else "Pending"
-
-    # Update the refill request status
-    update_response = supabase.table('refillrequest').update({
-        'status': status,
-        'updated_at': datetime.utcnow().isoformat()
-    }).eq('request_id', request_id).execute()
-    if update_response.error:
-        raise Exception(f"Error updating refill request: {update_response.error.message}")
-
-    # Create approval record
-    approval_data = {
-        'refill_request_id': request_id,
-        'approver': approver,
-        'role': role,
-        'action': action.lower(),
-        'comment': comment,
-        'timestamp': datetime.utcnow().isoformat()
-    }
-    approval_response = supabase.table('approvalrecord').insert(approval_data).execute()
-    if approval_response.error:
-        raise Exception(f"Error creating approval record: {approval_response.error.message}")
-
-    return update_response.data[0]
-
-async def get_user(username: str):
-    response = supabase.table('users').select('*').eq('username', username).execute()
-    if response.error:
-        raise Exception(f"Error fetching user: {response.error.message}")
-    users = response.data
-    if not users:
-        return None
-    return users[0]
+    # Conditional status update and approval record in one transaction, one round trip
+    return await call_transition(get_async_client(), 'take_action_on_refillrequest', {
+        'p_request_id': request_id,
+        'p_action': action,
+        'p_approver': approver,
+        'p_role': role,
+        'p_comment': comment
+    })
@@ -0,0 +1,12 @@
+import numpy as np
+import pandas as pd
+from compact_model import CompactModel, compile_model
+from features import build_features
+
+def test_compact_model_matches_sklearn(tmp_path, fitted_ensemble):
+    model = fitted_ensemble
+    compact = compile_model(model)
+    X = build_features(pd.date_range("2024-01-01", periods=90))
+    np.testing.assert_allclose(compact.predict(X), model.predict(X), rtol=1e-5)
+    compact.save(tmp_path / "compact.npz")
+    np.testing.assert_array_equal(CompactModel.load(tmp_path / "compact.npz").predict(X), compact.predict(X))
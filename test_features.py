@@ -0,0 +1,23 @@
+import pandas as pd
+from features import FEATURE_COLUMNS, HolidayCalendar, add_calendar_features, build_features
+
+def test_calendar_flags_match_rowwise_definitions():
+    dates = pd.date_range("2023-12-20", "2024-01-10")
+    df = add_calendar_features(pd.DataFrame({"date": dates}))
+    assert list(df["Month_end"]) == [1 if d.day > 27 or d.day < 3 else 0 for d in dates]
+    assert list(df["is_weekend"]) == [1 if d.dayofweek >= 5 else 0 for d in dates]
+
+def test_build_features_flags_holidays():
+    features = build_features(pd.date_range("2023-12-24", periods=3))
+    assert list(features.columns) == FEATURE_COLUMNS
+    # Christmas Day and Boxing Day are public holidays in Nigeria
+    assert list(features["is_holiday"]) == [0, 1, 1]
+
+def test_holiday_calendar_closures_and_range_extension():
+    calendar = HolidayCalendar(2023, 2023)
+    assert "2023-12-25" in calendar
+    assert "2023-12-27" not in calendar
+    calendar.add_closures(["2023-12-27"])
+    assert list(calendar.contains(["2023-12-26", "2023-12-27", "2023-12-28"])) == [True, True, False]
+    assert "2024-01-01" in calendar
+    assert calendar.years == (2023, 2024)
@@ -0,0 +1,29 @@
+import time
+import numpy as np
+from forecast_cache import ForecastCache, SQLiteForecastStore
+
+def test_longer_horizon_answers_shorter_request():
+    cache = ForecastCache(max_entries=10, ttl=60)
+    cache.put("v1", "ATM123", "2024-01-01", np.arange(30.0))
+    assert list(cache.get("v1", "ATM123", "2024-01-01", 7)) == list(np.arange(7.0))
+    assert cache.get("v1", "ATM123", "2024-01-01", 90) is None
+    assert cache.get("v2", "ATM123", "2024-01-01", 7) is None
+    cache.invalidate("ATM123")
+    assert cache.get("v1", "ATM123", "2024-01-01", 7) is None
+
+def test_sqlite_store_shares_results_between_caches(tmp_path):
+    path = str(tmp_path / "forecasts.db")
+    ForecastCache(ttl=60, store=SQLiteForecastStore(path)).put("v1", "ATM123", "2024-01-01", np.arange(14.0))
+    other_worker = ForecastCache(ttl=60, store=SQLiteForecastStore(path))
+    assert list(other_worker.get("v1", "ATM123", "2024-01-01", 3)) == [0.0, 1.0, 2.0]
+
+def test_sqlite_store_purges_expired_and_excess_rows(tmp_path):
+    store = SQLiteForecastStore(str(tmp_path / "forecasts.db"), max_rows=3, purge_seconds=0)
+    store.put(("v1", "ATM1", "2024-01-01"), np.arange(7.0), time.time() - 1)
+    for day in range(2, 7):
+        store.put(("v1", "ATM1", f"2024-01-0{day}"), np.arange(7.0), time.time() + 60 + day)
+    assert store.get(("v1", "ATM1", "2024-01-01")) is None
+    assert store._conn.execute("SELECT count(*) FROM forecasts").fetchone()[0] == 3
+    # The rows closest to expiry go first
+    assert store.get(("v1", "ATM1", "2024-01-03")) is None
+    assert store.get(("v1", "ATM1", "2024-01-06")) is not None
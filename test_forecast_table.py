@@ -0,0 +1,27 @@
+import numpy as np
+import pandas as pd
+from features import build_features, date_feature_codes, feature_codes, feature_space
+from forecast_table import ForecastTable, TabulatedModel
+
+class FormulaModel:
+    def predict(self, features):
+        features = features.to_numpy()
+        return features @ np.array([100.0, 10.0, 7.0, 5.0, 3.0, 1.0])
+
+def test_feature_codes_index_the_feature_space():
+    dates = pd.date_range("2023-12-20", "2025-01-10")
+    features = build_features(dates)
+    codes = feature_codes(features, 2023)
+    assert (codes == date_feature_codes(dates.values, 2023)).all()
+    assert (feature_space(2023, 2025).iloc[codes].to_numpy() == features.to_numpy()).all()
+
+def test_tabulated_model_matches_model_and_falls_back_outside_table(tmp_path):
+    model = FormulaModel()
+    ForecastTable.build(model, 2023, 2024).save(tmp_path / "table.npz")
+    tabulated = TabulatedModel(model, ForecastTable.load(tmp_path / "table.npz"))
+    inside = pd.date_range("2024-12-01", periods=31)
+    outside = pd.date_range("2024-12-15", periods=31)
+    for dates in (inside, outside):
+        expected = model.predict(build_features(dates))
+        assert np.allclose(tabulated.predict_dates(dates.values), expected)
+        assert np.allclose(tabulated.predict(build_features(dates)), expected)
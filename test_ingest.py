@@ -0,0 +1,52 @@
+import pandas as pd
+import pytest
+from features import add_calendar_features
+from ingest import convert_to_parquet, detect_columns, read_daily_aggregates, read_parquet_daily_aggregates, refill_statistics, update_refill_state
+
+def test_chunked_daily_aggregates_match_full_groupby(tmp_path):
+    file = tmp_path / "transactions.csv"
+    file.write_text(
+        "Date,Amount,Balance,Terminal\n"
+        "2024-01-01 08:00,100,900,T1\n"
+        "2024-01-01 17:30,50,850,T1\n"
+        "2024-01-02 09:15,200,650,T1\n"
+        "2024-01-01 20:00,25,825,T1\n"
+        "2024-01-03 10:00,75,1925,T1\n"
+    )
+    columns = detect_columns(file)
+    assert columns == {"date": "Date", "amount": "Amount", "balance": "Balance"}
+    daily = read_daily_aggregates(file, columns, chunksize=2)
+    assert list(daily["date"]) == list(pd.to_datetime(["2024-01-01", "2024-01-02", "2024-01-03"]))
+    assert list(daily["Amount"]) == [175, 200, 75]
+    assert list(daily["Balance"]) == [825, 650, 1925]
+
+def test_parquet_conversion_ignores_extra_columns_that_change_type(tmp_path):
+    file = tmp_path / "transactions.csv"
+    # Enough rows that the Terminal column is typed as integers from the first block
+    rows = ["2024-01-01 08:00,100,900,1"] * 100000 + ["2024-01-02 09:00,50,850,T1"]
+    file.write_text("Date,Amount,Balance,Terminal\n" + "\n".join(rows) + "\n")
+    columns = {"date": "Date", "amount": "Amount", "balance": "Balance"}
+    convert_to_parquet(file, columns, tmp_path / "transactions.parquet")
+    daily = read_parquet_daily_aggregates(tmp_path / "transactions.parquet", columns)
+    assert list(daily["Amount"]) == [10000000, 50]
+
+def test_empty_csv_is_rejected(tmp_path):
+    file = tmp_path / "empty.csv"
+    file.write_text("")
+    with pytest.raises(ValueError):
+        detect_columns(file)
+
+def test_incremental_refill_state_matches_full_recomputation():
+    daily = add_calendar_features(pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=8),
+        "Amount": [100, 200, 150, 50, 300, 250, 100, 400],
+        "Balance": [900, 700, 550, 1500, 1200, 950, 2000, 1600]
+    }))
+    head, tail = daily.iloc[:5], daily.iloc[5:]
+    head_groups = refill_statistics(head, "Amount", "Balance")
+    state = {"last_date": "2024-01-05", "last_balance": 1200, "open_group_total": head_groups["Amount"].iloc[-1]}
+    state, max_refill = update_refill_state(state, head_groups["Amount"].max(), tail, "Amount", "Balance")
+    full_groups = refill_statistics(daily, "Amount", "Balance")
+    assert max_refill == full_groups["Amount"].max()
+    assert state["open_group_total"] == full_groups["Amount"].iloc[-1]
+    assert state["last_date"] == "2024-01-08"
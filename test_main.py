@@ -1,5 +1,8 @@
+import json
 import pytest
 from fastapi.testclient import TestClient
+import main
+import tokens
 from main import app
 
 client = TestClient(app)
@@ -71,3 +74,44 @@ def test_predict_refill_without_training():
     response = client.get("/predict-refill/", params={"current_date": "2023-01-01", "days": 5}, headers=headers)
     assert response.status_code == 400
     assert "Model not trained" in response.json()["detail"]
+
+def test_self_created_account_cannot_choose_its_role(monkeypatch):
+    monkeypatch.setattr(tokens, "JWT_SECRET", "test-secret")
+    inserted = []
+
+    async def fake_execute(query, action):
+        inserted.append(action)
+
+    async def staff_record(email):
+        return {"email": email, "role": "ATM Operations Staff"}
+
+    monkeypatch.setattr(main, "execute", fake_execute)
+    monkeypatch.setattr(main, "get_user_by_email", staff_record)
+    monkeypatch.setattr(main, "user_cache", tokens.UserCache())
+    body = {"username": "mallory", "email": "mallory@example.com", "password": "pw",
+            "role": "Head Office Authorization Officer"}
+    assert client.post("/api/v1/users", json=body).status_code == 401
+    token = tokens.create_access_token("mallory@example.com", "Head Office Authorization Officer")
+    response = client.post("/api/v1/users", json=body, headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 403
+    assert inserted == []
+
+def test_batch_forecasts_stream_request_indexes(monkeypatch):
+    class FakeModelService:
+        def predict_refill_batch(self, requests):
+            # Grouped by model, not in request order
+            for index in sorted(range(len(requests)), key=lambda i: requests[i][0]):
+                yield {"index": index, "atm_id": requests[index][0]}
+
+    monkeypatch.setattr(main, "model_service", FakeModelService())
+    monkeypatch.setattr(main, "BULK_MAX_ITEMS", 3)
+    app.dependency_overrides[main.get_current_user] = lambda: {"username": "ops", "role": "ATM Operations Staff"}
+    try:
+        body = [{"atm_id": atm_id, "current_date": "2024-01-01"} for atm_id in ("B", "A", "B")]
+        response = client.post("/api/v1/forecasts/batch", json=body)
+        assert response.status_code == 200
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert lines == [{"index": 1, "atm_id": "A"}, {"index": 0, "atm_id": "B"}, {"index": 2, "atm_id": "B"}]
+        assert client.post("/api/v1/forecasts/batch", json=body * 2).status_code == 400
+    finally:
+        app.dependency_overrides.clear()
@@ -0,0 +1,106 @@
+import threading
+import numpy as np
+import pandas as pd
+import pytest
+import model_store
+from features import build_features
+from model_registry import DEFAULT_MODEL_KEY, ModelRegistry
+
+def test_least_recently_used_model_is_evicted_and_reloaded(tmp_path, monkeypatch, fitted_ensemble):
+    model = fitted_ensemble
+    registry = ModelRegistry(tmp_path, max_bytes=1)
+    registry.register("a", model, {})
+    # Room for exactly two models of this size
+    registry.max_bytes = 2 * registry.stats()["loaded_bytes"]
+    registry.register("b", model, {})
+    registry.get("a")
+    registry.register("c", model, {})
+    assert list(registry._entries) == ["a", "c"]
+    assert registry.stats()["loaded_bytes"] <= registry.max_bytes
+
+    loads = []
+    load_compact_model = model_store.load_compact_model
+
+    def counting_load(model_dir, key, version=None):
+        loads.append(key)
+        return load_compact_model(model_dir, key, version)
+
+    monkeypatch.setattr(model_store, "load_compact_model", counting_load)
+    reloaded, metadata = registry.get("b")
+    assert loads == ["b"]
+    assert list(registry._entries) == ["c", "b"]
+    X = build_features(pd.date_range("2024-01-01", periods=30))
+    np.testing.assert_allclose(reloaded.predict(X), model.predict(X), rtol=1e-5)
+    assert metadata["version"] == model_store.latest_version(tmp_path, "b")
+
+def test_budget_smaller_than_one_model_keeps_the_latest(tmp_path, fitted_ensemble):
+    model = fitted_ensemble
+    registry = ModelRegistry(tmp_path, max_bytes=1)
+    registry.register("a", model, {})
+    registry.register("b", model, {})
+    assert list(registry._entries) == ["b"]
+    assert registry.get("a") is not None
+    assert list(registry._entries) == ["a"]
+
+def test_cluster_assignment_resolves_to_cluster_model(tmp_path):
+    registry = ModelRegistry(tmp_path)
+    registry.assign("ATM1", "urban")
+    assert registry.resolve("ATM1") == "urban"
+    assert registry.resolve("ATM2") == "ATM2"
+    assert registry.resolve(None) == DEFAULT_MODEL_KEY
+    # Assignments are stored with the models, e.g. for training processes
+    assert ModelRegistry(tmp_path).resolve("ATM1") == "urban"
+    with pytest.raises(ValueError):
+        registry.resolve("..")
+    with pytest.raises(ValueError):
+        registry.assign("ATM3", "../data_cache")
+
+def test_missing_models_are_remembered(tmp_path, monkeypatch):
+    registry = ModelRegistry(tmp_path)
+    loads = []
+    load_model = model_store.load_model
+
+    def counting_load(model_dir, key, version=None):
+        loads.append(key)
+        return load_model(model_dir, key, version)
+
+    monkeypatch.setattr(model_store, "load_model", counting_load)
+    assert registry.get("ATM1") is None
+    assert registry.get("ATM1") is None
+    assert loads == ["ATM1"]
+
+def test_loading_one_model_does_not_block_others(tmp_path, monkeypatch, fitted_ensemble):
+    registry = ModelRegistry(tmp_path)
+    registry.register("a", fitted_ensemble, {})
+    started, release = threading.Event(), threading.Event()
+    load_compact_model = model_store.load_compact_model
+
+    def slow_load(model_dir, key, version=None):
+        if key == "slow":
+            started.set()
+            release.wait(5)
+        return load_compact_model(model_dir, key, version)
+
+    monkeypatch.setattr(model_store, "load_compact_model", slow_load)
+    loader = threading.Thread(target=registry.get, args=("slow",))
+    loader.start()
+    assert started.wait(5)
+    results = []
+    reader = threading.Thread(target=lambda: results.extend([registry.get("a"), registry.get("b")]))
+    reader.start()
+    reader.join(2)
+    release.set()
+    loader.join()
+    assert not reader.is_alive() and results[0] is not None and results[1] is None
+
+def test_refresh_picks_up_models_from_other_processes(tmp_path, fitted_ensemble):
+    serving, training = ModelRegistry(tmp_path), ModelRegistry(tmp_path)
+    serving.register("a", fitted_ensemble, {})
+    assert serving.get("b") is None
+    version = training.register("a", fitted_ensemble, {})
+    training.register("b", fitted_ensemble, {})
+    training.assign("ATM1", "b")
+    assert serving.refresh() == ["a"]
+    assert serving.get("a")[1]["version"] == version
+    assert serving.get("b") is not None
+    assert serving.resolve("ATM1") == "b"
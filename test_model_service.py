@@ -0,0 +1,135 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.base import clone
+from features import add_calendar_features, build_features
+from ingest import read_daily_aggregates, save_daily_aggregates
+from model_registry import ModelRegistry
+from model_service import ModelService
+
+class ConstantModel:
+    def predict(self, features):
+        return np.full(len(features), 1000.0)
+
+def _service(tmp_path, residuals):
+    service = ModelService(ModelRegistry(tmp_path))
+    service.default_entry = (ConstantModel(), {"residuals": residuals})
+    return service
+
+def test_distribution_quantiles_and_stockout_probability(tmp_path):
+    residuals = list(np.random.default_rng(0).normal(0, 200, 500))
+    service = _service(tmp_path, residuals)
+    result = service.predict_refill_distribution("2024-01-01", 14, loaded_amount=7000, n_paths=2000, seed=1)
+    assert result == service.predict_refill_distribution("2024-01-01", 14, loaded_amount=7000, n_paths=2000, seed=1)
+    stockout = []
+    for day in result["daily_predictions"]:
+        assert day["withdrawal_p50"] <= day["withdrawal_p90"] <= day["withdrawal_p99"]
+        assert day["running_total_p50"] <= day["running_total_p90"] <= day["running_total_p99"]
+        stockout.append(day["stockout_probability"])
+    assert result["total_p50"] <= result["total_p90"] <= result["total_p99"]
+    assert np.all(np.diff(stockout) >= 0)
+    assert stockout[0] == 0 and stockout[-1] == 1 and result["stockout_probability"] == 1
+
+    empty = service.predict_refill_distribution("2024-01-01", 14, loaded_amount=0, n_paths=500, seed=1)
+    full = service.predict_refill_distribution("2024-01-01", 14, loaded_amount=1e9, n_paths=500, seed=1)
+    assert all(day["stockout_probability"] == 1 for day in empty["daily_predictions"])
+    assert all(day["stockout_probability"] == 0 for day in full["daily_predictions"])
+
+def test_distribution_requires_residuals(tmp_path):
+    service = _service(tmp_path, [])
+    with pytest.raises(ValueError):
+        service.predict_refill_distribution("2024-01-01", 14, loaded_amount=7000)
+
+def _write_transactions(path, dates):
+    # One withdrawal a day; the ATM is refilled every Monday
+    rng = np.random.default_rng(len(dates))
+    amounts = 50000 + 8000 * (dates.dayofweek >= 5) + rng.normal(0, 2000, len(dates))
+    balances = 500000 - 60000 * (dates.dayofweek + 1)
+    rows = [f"{date:%Y-%m-%d} 10:00,{amount:.2f},{balance}" for date, amount, balance in zip(dates, amounts, balances)]
+    path.write_text("Date,Amount,Balance\n" + "\n".join(rows) + "\n")
+    return path
+
+def _trained_service(tmp_path, model, test_mse):
+    """ModelService over a default model trained on 2022-2023, as train_model would leave it."""
+    columns = {"date": "Date", "amount": "Amount", "balance": "Balance"}
+    history = _write_transactions(tmp_path / "history.csv", pd.date_range("2022-01-01", "2023-12-31"))
+    daily = add_calendar_features(read_daily_aggregates(history, columns), "date")
+    save_daily_aggregates(daily, "history")
+    service = ModelService(ModelRegistry(tmp_path / "models"))
+    max_refill, refill_state = service._refill_metadata(daily, "Amount", "Balance")
+    metadata = {"column_names": columns, "data_digest": "history", "max_refill": max_refill,
+                "refill_state": refill_state, "year_range": [2022, 2023], "residuals": [0.0] * 10}
+    if test_mse is not None:
+        metadata["test_mse"] = test_mse
+    service._publish("default", None, model, metadata)
+    return service
+
+@pytest.mark.parametrize("test_mse", [1e12, 0.0, None])
+def test_update_without_drift_refreshes_the_model(tmp_path, monkeypatch, fitted_ensemble, test_mse):
+    monkeypatch.chdir(tmp_path)  # daily aggregates are cached under the working directory
+    service = _trained_service(tmp_path, fitted_ensemble, test_mse)
+    new_days = _write_transactions(tmp_path / "new.csv", pd.date_range("2024-01-01", periods=14))
+    result = service.update_model(str(new_days))
+    assert result["full_retrain"] is False and result["days_added"] == 14
+    updated, metadata = service.registry.load("default")
+    assert metadata["version"] == result["model_version"]
+    assert metadata["year_range"] == [2022, 2024]
+    assert metadata["refill_state"]["last_date"] == "2024-01-14"
+    assert len(metadata["residuals"]) == 10 + 14
+    # A couple of weeks on two years of history adds a round, not a full INCREMENTAL_BOOST_ROUNDS
+    rounds = fitted_ensemble.named_estimators_["xgb"].get_booster().num_boosted_rounds()
+    assert updated.named_estimators_["xgb"].get_booster().num_boosted_rounds() == rounds + 1
+    assert fitted_ensemble.named_estimators_["xgb"].get_booster().num_boosted_rounds() == rounds
+    X = build_features(pd.date_range("2024-02-01", periods=30))
+    rf, original_rf = updated.named_estimators_["rf"], fitted_ensemble.named_estimators_["rf"]
+    np.testing.assert_array_equal(rf.predict(X), original_rf.predict(X))
+    np.testing.assert_array_equal(updated.final_estimator_.coef_, fitted_ensemble.final_estimator_.coef_)
+
+def test_update_with_drift_retrains_on_merged_history(tmp_path, monkeypatch, fitted_ensemble):
+    monkeypatch.chdir(tmp_path)
+    service = _trained_service(tmp_path, fitted_ensemble, 1.0)
+    retrained = []
+
+    def train_from_daily(daily, column_names, data_digest, atm_id, n_jobs, progress, search):
+        retrained.append((daily, search))
+        return {"message": "Model trained successfully"}
+
+    monkeypatch.setattr(service, "_train_from_daily", train_from_daily)
+    new_days = _write_transactions(tmp_path / "new.csv", pd.date_range("2024-01-01", periods=14))
+    result = service.update_model(str(new_days), search="fast")
+    assert result["full_retrain"] is True and result["drift_ratio"] > 1.5
+    (daily, search), = retrained
+    assert search == "fast"
+    assert len(daily) == 365 + 365 + 14
+    assert daily["date"].iloc[-1] == pd.Timestamp("2024-01-14")
+
+def test_refresh_serves_default_model_published_elsewhere(tmp_path, fitted_ensemble):
+    serving = ModelService(ModelRegistry(tmp_path / "models"))
+    training = ModelService(ModelRegistry(tmp_path / "models"))
+    version = training._publish("default", None, fitted_ensemble, {"year_range": [2022, 2023]})
+    assert serving.trained_model is None
+    assert serving.refresh_models() == ["default"]
+    assert serving.model_metadata["version"] == version
+    assert serving.refresh_models() == []
+
+def test_batch_forecasts_match_single_forecasts(tmp_path, fitted_ensemble):
+    service = ModelService(ModelRegistry(tmp_path / "models"))
+    service._publish("default", None, fitted_ensemble, {"year_range": [2022, 2023]})
+    X = build_features(pd.date_range("2022-01-01", "2023-12-31"))
+    own_model = clone(fitted_ensemble).fit(X, 30000 + 20000 * X["is_weekend"])
+    service._publish("ATM7", "ATM7", own_model, {"year_range": [2022, 2023]})
+    requests = [
+        ("ATM7", "2024-01-01", 5), ("ATM1", "2024-03-01", 10), ("ATM7", "2024-01-01", 5),
+        ("ATM1", "2024-03-01", 0), ("ATM7", "2024-12-25", 40), ("ATM2", "2024-01-01", 5)
+    ]
+    expected = [{"atm_id": atm_id, **service.predict_refill(date, days, atm_id)} for atm_id, date, days in requests]
+    assert expected[0]["total_predicted_amount"] != expected[5]["total_predicted_amount"]
+    service.forecast_cache.invalidate("default")
+    service.forecast_cache.invalidate("ATM7")
+    for _ in range(2):  # scored, then answered from the forecast cache
+        assert service.predict_refill_many(requests) == expected
+        streamed = {result.pop("index"): result for result in service.predict_refill_batch(requests)}
+        assert [streamed[index] for index in range(len(requests))] == expected
+    matrix = service.forecast_matrix(["ATM7", "ATM1"], "2024-01-01", 5)
+    assert matrix[0].sum() == pytest.approx(expected[0]["total_predicted_amount"])
+    assert matrix[1].sum() == pytest.approx(expected[5]["total_predicted_amount"])
@@ -0,0 +1,32 @@
+import joblib
+import numpy as np
+import pandas as pd
+import pytest
+import model_store
+from features import build_features
+
+def test_save_and_load_round_trip(tmp_path, monkeypatch, fitted_ensemble):
+    monkeypatch.setattr(model_store, "KEEP_VERSIONS", 2)
+    model = fitted_ensemble
+    (tmp_path / "default" / "notes").mkdir(parents=True)
+    versions = [model_store.save_model(tmp_path, "default", model, {"trained_on": i}) for i in range(3)]
+    assert model_store.latest_version(tmp_path, "default") == versions[-1]
+    kept = sorted(p.name for p in (tmp_path / "default").iterdir() if p.is_dir())
+    assert kept == sorted(versions[1:] + ["notes"])
+    loaded, metadata = model_store.load_model(tmp_path, "default")
+    assert metadata == {"trained_on": 2, "version": versions[-1]}
+    # The booster is stored natively, not pickled, and reattached on load
+    version_dir = tmp_path / "default" / versions[-1]
+    assert (version_dir / "xgb_xgb.ubj").exists()
+    assert "_Booster" not in joblib.load(version_dir / "model.joblib").named_estimators_["xgb"].__dict__
+    model.named_estimators_["xgb"].get_booster()  # the saved model keeps its own
+    X = build_features(pd.date_range("2024-01-01", periods=60))
+    np.testing.assert_array_equal(loaded.named_estimators_["xgb"].predict(X), model.named_estimators_["xgb"].predict(X))
+    np.testing.assert_array_equal(loaded.predict(X), model.predict(X))
+
+@pytest.mark.parametrize("key", ["..", ".", "../default", "a/b", ""])
+def test_rejects_keys_outside_model_dir(tmp_path, key, fitted_ensemble):
+    with pytest.raises(ValueError):
+        model_store.save_model(tmp_path / "models", key, fitted_ensemble, {})
+    with pytest.raises(ValueError):
+        model_store.load_model(tmp_path / "models", key)
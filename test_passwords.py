@@ -0,0 +1,39 @@
+import asyncio
+import threading
+from passlib.context import CryptContext
+from passwords import PasswordHasher
+
+def _context(rounds):
+    return CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__default_rounds=rounds,
+                        bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+
+def test_hash_with_another_cost_is_rehashed():
+    hasher = PasswordHasher(_context(4), max_workers=2)
+    try:
+        old_hash = _context(5).hash("secret")
+        valid, new_hash = asyncio.run(hasher.verify_and_update("secret", old_hash))
+        assert valid and new_hash is not None and new_hash.startswith("$2b$04$")
+        assert asyncio.run(hasher.verify_and_update("secret", new_hash)) == (True, None)
+        assert asyncio.run(hasher.verify_and_update("wrong", old_hash)) == (False, None)
+    finally:
+        hasher.shutdown()
+
+def test_calls_beyond_the_pool_size_wait_in_the_queue():
+    hasher = PasswordHasher(_context(4), max_workers=1)
+    release = threading.Event()
+
+    async def scenario():
+        calls = [asyncio.ensure_future(hasher._run(release.wait, 5)) for _ in range(3)]
+        await asyncio.sleep(0.1)
+        during = hasher.stats()
+        release.set()
+        await asyncio.gather(*calls)
+        return during
+
+    try:
+        during = asyncio.run(scenario())
+        assert during["running"] == 1 and during["queued"] == 2
+        after = hasher.stats()
+        assert after["completed"] == 3 and after["queued"] == 0 and after["max_wait_seconds"] > 0
+    finally:
+        hasher.shutdown()
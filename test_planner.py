@@ -0,0 +1,18 @@
+import numpy as np
+from planner import plan_refills
+
+def test_current_balance_is_used_before_the_first_refill():
+    demand = np.full((1, 10), 100.0)
+    loads, costs = plan_refills(demand, [250], [1000], visit_cost=100, holding_rate=0.01, safety_factor=0.0)
+    # 250 covers days 1-2 and half of day 3, so one visit on day 3 loads the remaining 750
+    assert list(np.flatnonzero(loads[0])) == [2]
+    assert loads[0, 2] == 750
+    # Visit cost plus the holding cost of each day's cash until it is withdrawn
+    assert costs[0] == 100 + 0.01 * sum(day * 100 for day in range(1, 8))
+
+def test_capacity_forces_extra_visits_and_caps_loads():
+    demand = np.full((2, 10), 100.0)
+    loads, _ = plan_refills(demand, [250, 250], [300, 1000], visit_cost=100, holding_rate=0.01, safety_factor=0.0)
+    assert loads[0].max() <= 300
+    assert loads[0].sum() == 750
+    assert (loads[0] > 0).sum() > (loads[1] > 0).sum()
@@ -0,0 +1,45 @@
+import asyncio
+from prediction_batcher import PredictionBatcher
+
+class FakeModelService:
+    def __init__(self):
+        self.calls = []
+
+    def predict_refill_many(self, requests):
+        self.calls.append(list(requests))
+        if any(atm_id == "untrained" for atm_id, _, _ in requests):
+            raise ValueError("Model not trained for ATM untrained. Please train first.")
+        if any(days < 0 for _, _, days in requests):
+            raise OverflowError("Cannot generate range with negative periods")
+        return [{"atm_id": atm_id, "days_requested": days} for atm_id, _, days in requests]
+
+def test_concurrent_requests_share_one_predict_call():
+    service = FakeModelService()
+
+    async def scenario():
+        batcher = PredictionBatcher(service, window_ms=20, max_batch_size=100)
+        results = await asyncio.gather(*(batcher.predict(f"ATM{i}", "2024-01-01", i + 1) for i in range(10)))
+        return results, batcher.stats()
+
+    results, stats = asyncio.run(scenario())
+    assert len(service.calls) == 1
+    assert [result["atm_id"] for result in results] == [f"ATM{i}" for i in range(10)]
+    assert [result["days_requested"] for result in results] == list(range(1, 11))
+    assert stats["batches"] == 1 and stats["max_batch_size"] == 10
+
+def test_failing_request_does_not_fail_its_batch():
+    service = FakeModelService()
+
+    async def scenario():
+        batcher = PredictionBatcher(service, window_ms=20, max_batch_size=3)
+        return await asyncio.gather(
+            batcher.predict("ATM1", "2024-01-01", 7),
+            batcher.predict("untrained", "2024-01-01", 7),
+            batcher.predict("ATM2", "2024-01-01", -1),
+            return_exceptions=True
+        )
+
+    ok, untrained, negative = asyncio.run(scenario())
+    assert ok["atm_id"] == "ATM1"
+    assert isinstance(untrained, ValueError)
+    assert isinstance(negative, OverflowError)
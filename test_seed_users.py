@@ -0,0 +1,40 @@
+import pytest
+from passlib.context import CryptContext
+import seed_users
+from seed_users import provision
+
+class FakeSupabase:
+    def __init__(self, fail_on_call=None):
+        self.upserts = []
+        self.fail_on_call = fail_on_call
+
+    def table(self, name):
+        assert name == "users"
+        return self
+
+    def upsert(self, rows, on_conflict):
+        assert on_conflict == "username"
+        if len(self.upserts) + 1 == self.fail_on_call:
+            raise ConnectionError("connection reset")
+        self.upserts.append(rows)
+        return self
+
+    def execute(self):
+        return self
+
+def test_provision_resumes_from_checkpoint(tmp_path, monkeypatch):
+    # Cheap hashes; the forked hashing workers inherit the patched context
+    fast_context = CryptContext(schemes=["bcrypt"], bcrypt__default_rounds=4)
+    monkeypatch.setattr(seed_users, "pwd_context", fast_context)
+    records = [{"username": f"user{i}", "email": f"user{i}@example.com", "password": f"pw{i}"} for i in range(5)]
+    records[0]["role"] = "Branch Operations Manager"
+    checkpoint = tmp_path / "users.csv.checkpoint"
+    interrupted = FakeSupabase(fail_on_call=2)
+    with pytest.raises(ConnectionError):
+        provision(interrupted, records, batch_size=2, workers=2, checkpoint=checkpoint)
+    resumed = FakeSupabase()
+    assert provision(resumed, records, batch_size=2, workers=2, checkpoint=checkpoint) == 5
+    rows = [row for batch in interrupted.upserts + resumed.upserts for row in batch]
+    assert [row["username"] for row in rows] == [record["username"] for record in records]
+    assert [row["role"] for row in rows] == ["Branch Operations Manager"] + ["ATM Operations Staff"] * 4
+    assert all(fast_context.verify(record["password"], row["password"]) for record, row in zip(records, rows))
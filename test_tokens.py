@@ -0,0 +1,33 @@
+import asyncio
+import pytest
+from tokens import InvalidTokenError, UserCache, create_access_token, decode_access_token
+
+def test_token_round_trip_and_expiry():
+    token = create_access_token("atm_ops", "ATM Operations Staff", secret="test-secret")
+    claims = decode_access_token(token, secret="test-secret")
+    assert claims["sub"] == "atm_ops"
+    assert claims["role"] == "ATM Operations Staff"
+    with pytest.raises(InvalidTokenError):
+        decode_access_token(token, secret="other-secret")
+    expired = create_access_token("atm_ops", "ATM Operations Staff", ttl=-10, secret="test-secret")
+    with pytest.raises(InvalidTokenError):
+        decode_access_token(expired, secret="test-secret")
+
+def test_user_cache_loads_once_until_invalidated():
+    calls = []
+
+    async def loader(username):
+        calls.append(username)
+        return {"username": username, "role": "Vault Manager"}
+
+    async def scenario():
+        cache = UserCache(ttl=60)
+        await cache.get("vault", loader)
+        await cache.get("vault", loader)
+        cache.invalidate("vault")
+        await cache.get("vault", loader)
+        return cache.stats()
+
+    stats = asyncio.run(scenario())
+    assert calls == ["vault", "vault"]
+    assert stats["hits"] == 1
@@ -0,0 +1,78 @@
+import os
+import time
+from collections import OrderedDict
+import jwt
+
+JWT_SECRET = os.getenv("JWT_SECRET")
+JWT_ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+ACCESS_TOKEN_TTL = int(os.getenv("ACCESS_TOKEN_TTL", "3600"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "60"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+
+
+class InvalidTokenError(Exception):
+    """The access token is malformed, forged or expired."""
+
+
+def _secret(secret: str = None) -> str:
+    secret = secret or JWT_SECRET
+    if not secret:
+        raise Exception("JWT secret is missing")
+    return secret
+
+
+def create_access_token(username: str, role: str, ttl: int = ACCESS_TOKEN_TTL, secret: str = None) -> str:
+    """Signed access token carrying the username (sub) and role."""
+    now = int(time.time())
+    payload = {"sub": username, "role": role, "iat": now, "exp": now + ttl}
+    return jwt.encode(payload, _secret(secret), algorithm=JWT_ALGORITHM)
+
+
+def decode_access_token(token: str, secret: str = None) -> dict:
+    """Verify an access token locally and return its claims."""
+    try:
+        return jwt.decode(
+            token, _secret(secret), algorithms=[JWT_ALGORITHM], options={"require": ["sub", "role", "exp"]}
+        )
+    except jwt.PyJWTError as e:
+        raise InvalidTokenError(str(e))
+
+
+class UserCache:
+    """
+    User records keyed by username, kept for ttl seconds.
+
+    Tokens are verified without a database call, but the user record is
+    still consulted so that a deleted user or a changed role takes effect
+    within ttl seconds instead of when the token expires. Missing users
+    are cached too. Only used from the event loop, so no locking.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL, max_entries: int = USER_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()  # username -> (expires_at, user or None)
+        self.hits = 0
+        self.misses = 0
+
+    async def get(self, username: str, loader):
+        """The cached record for username, calling `await loader(username)` on a miss."""
+        now = time.monotonic()
+        entry = self._entries.get(username)
+        if entry is not None and entry[0] > now:
+            self._entries.move_to_end(username)
+            self.hits += 1
+            return entry[1]
+        self.misses += 1
+        user = await loader(username)
+        self._entries[username] = (time.monotonic() + self.ttl, user)
+        self._entries.move_to_end(username)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return user
+
+    def invalidate(self, username: str):
+        self._entries.pop(username, None)
+
+    def stats(self):
+        return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,112 @@
+import multiprocessing
+import os
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+
+TRAINING_MAX_WORKERS = int(os.getenv("TRAINING_MAX_WORKERS", "1"))
+TRAINING_CORES = int(os.getenv("TRAINING_CORES", str(max(1, (os.cpu_count() or 2) // 2))))
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+def _run_training(csv_path: str, atm_id: str, model_dir: str, n_jobs: int, search: str, update: bool, state):
+    """Worker entry point: train (or update), persist the artifact and report progress through state."""
+    from threadpoolctl import threadpool_limits
+    from model_registry import ModelRegistry
+    from model_service import ModelService
+
+    def report(stage, completed, total):
+        state["stage"] = stage
+        state["completed_stages"] = completed
+        state["total_stages"] = total
+
+    state["status"] = "running"
+    state["started_at"] = _now()
+    # Keep BLAS/OpenMP threads inside the job's core budget as well; this only reaches
+    # this process, so search workers get single-threaded estimators instead
+    with threadpool_limits(limits=n_jobs):
+        service = ModelService(ModelRegistry(model_dir))
+        if update:
+            return service.update_model(csv_path, atm_id=atm_id, n_jobs=n_jobs, progress=report, search=search)
+        return service.train_model(csv_path, atm_id=atm_id, n_jobs=n_jobs, progress=report, search=search)
+
+
+class TrainingJobQueue:
+    """
+    Runs ModelService.train_model in a separate process pool so training
+    never blocks the event loop or competes with forecasts for every core.
+
+    Each job trains into the shared model directory; when it finishes, the
+    new artifact is swapped into the serving ModelService.
+
+    The queue and job states belong to one API process: with several
+    workers, a job's status is only known to the worker that accepted it
+    (others answer 404), and the other workers serve the new model once
+    their periodic ModelService.refresh_models() sees it on disk.
+    """
+
+    def __init__(self, model_service, max_workers: int = TRAINING_MAX_WORKERS, cores_per_job: int = TRAINING_CORES):
+        self.model_service = model_service
+        self.cores_per_job = cores_per_job
+        context = multiprocessing.get_context("spawn")
+        self._manager = context.Manager()
+        self._executor = ProcessPoolExecutor(max_workers=max_workers, mp_context=context)
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def submit(self, csv_path: str, atm_id: str = None, search: str = "randomized", update: bool = False) -> str:
+        """Queue a job; raises ValueError if atm_id cannot be used as a model key."""
+        self.model_service.registry.resolve(atm_id)
+        job_id = str(uuid.uuid4())
+        state = self._manager.dict({
+            "status": "queued",
+            "stage": None,
+            "completed_stages": 0,
+            "total_stages": None,
+            "submitted_at": _now(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None
+        })
+        with self._lock:
+            self._jobs[job_id] = {"job_id": job_id, "atm_id": atm_id, "csv_path": csv_path, "search": search,
+                                "update": update, "state": state}
+        future = self._executor.submit(
+            _run_training, csv_path, atm_id, str(self.model_service.registry.model_dir), self.cores_per_job, search, update, state
+        )
+        future.add_done_callback(lambda f: self._finish(job_id, f))
+        return job_id
+
+    def _finish(self, job_id: str, future):
+        state = self._jobs[job_id]["state"]
+        try:
+            result = future.result()
+            self.model_service.reload_model(self._jobs[job_id]["atm_id"])
+            state["result"] = result
+            state["status"] = "done"
+        except Exception as e:
+            state["error"] = str(e)
+            state["status"] = "failed"
+        state["finished_at"] = _now()
+
+    def status(self, job_id: str):
+        job = self._jobs.get(job_id)
+        if job is None:
+            return None
+        return {
+            "job_id": job_id,
+            "atm_id": job["atm_id"],
+            "csv_path": job["csv_path"],
+            "search": job["search"],
+            "update": job["update"],
+            **dict(job["state"])
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._manager.shutdown()